@@ -0,0 +1,262 @@
+import io
+import mmap
+import os
+import stat as stat_module
+import struct
+import threading
+import time
+import zipfile
+import zlib
+from collections import namedtuple
+
+from .utils import scandir as scandir_directory
+
+
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+
+
+#: The result of :meth:`ZipArchive.stat`. It has the same attributes as
+#: :func:`os.stat` results that are used by Gears.
+ArchiveStat = namedtuple('ArchiveStat', 'st_mode st_ino st_size st_mtime st_mtime_ns')
+
+
+class ZipArchive(object):
+    """The zip archive, whose central directory is read once into the tree of
+    members, and whose contents are read through the memory map of the
+    archive file, so reading many small members doesn't require any system
+    calls. Stored and deflated members are read directly from the map, other
+    compression methods are handled by :mod:`zipfile`.
+
+    :param path: the absolute path to the archive.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._zipfile = zipfile.ZipFile(self._file)
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self._lock = threading.Lock()
+        self.mtime = os.fstat(self._file.fileno()).st_mtime
+
+        #: Members of the archive, keyed by their names.
+        self.members = {}
+
+        #: The tree of members. It is a dict with names of entries as keys,
+        #: and trees of directories or ``None`` for files as values.
+        self.tree = {}
+
+        for info in self._zipfile.infolist():
+            parts = info.filename.rstrip('/').split('/')
+            tree = self.tree
+            for part in parts[:-1]:
+                tree = tree.setdefault(part, {})
+            if info.filename.endswith('/'):
+                tree.setdefault(parts[-1], {})
+            else:
+                tree[parts[-1]] = None
+                self.members[info.filename] = info
+
+    def close(self):
+        self._map.close()
+        self._zipfile.close()
+        self._file.close()
+
+    def read(self, name):
+        """Return the contents of the member with passed ``name`` as bytes."""
+        info = self._get_info(name)
+        data = self._read_raw(info)
+        if data is None:
+            with self._lock:
+                return self._zipfile.read(info)
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(data)
+        if zlib.crc32(data) & 0xffffffff != info.CRC:
+            raise zipfile.BadZipfile('Bad CRC-32 for %s' % name)
+        return data
+
+    def stat(self, name):
+        """Return :class:`ArchiveStat` for the member or the directory with
+        passed ``name``. The CRC-32 of the member is used as its inode number,
+        so the signature of the member is changed with its contents.
+        """
+        info = self.members.get(name)
+        if info is None:
+            self._get_tree(name)
+            return ArchiveStat(stat_module.S_IFDIR | 0o555, 0, 0, self.mtime,
+                               int(self.mtime * 1e9))
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        return ArchiveStat(stat_module.S_IFREG | 0o444, info.CRC,
+                           info.file_size, mtime, int(mtime * 1e9))
+
+    def scandir(self, name):
+        """Return the sorted list of two-tuples with names of entries of the
+        directory with passed ``name`` and flags telling if they are
+        directories.
+        """
+        tree = self._get_tree(name)
+        return sorted((n, child is not None) for n, child in tree.items())
+
+    def _get_info(self, name):
+        try:
+            return self.members[name]
+        except KeyError:
+            raise IOError('%s is not found in %s' % (name, self.path))
+
+    def _get_tree(self, name):
+        tree = self.tree
+        for part in filter(None, name.split('/')):
+            if not isinstance(tree, dict) or part not in tree:
+                raise OSError('%s is not found in %s' % (name, self.path))
+            tree = tree[part]
+        if tree is None:
+            raise OSError('%s is not a directory' % name)
+        return tree
+
+    def _read_raw(self, info):
+        if (info.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED) or
+                info.flag_bits & 0x1):
+            return None
+        offset = info.header_offset
+        header = LOCAL_HEADER.unpack_from(self._map, offset)
+        if header[0] != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipfile('Bad local header for %s' % info.filename)
+        offset += LOCAL_HEADER.size + header[-2] + header[-1]
+        return self._map[offset:offset + info.compress_size]
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+_registered = set()
+
+
+def register_archive(path):
+    """Register the archive with passed absolute ``path``, so paths inside of
+    it can be used as directories and files by :func:`stat`, :func:`read`,
+    :func:`scandir` and :func:`open_file`. The archive is opened on the first
+    use. :class:`~gears.finders.ArchiveFinder` registers its archives, so
+    cached assets and dependencies from them can be loaded in any process.
+    """
+    _registered.add(path)
+
+
+def open_archive(path):
+    """Return :class:`ZipArchive` for passed absolute ``path``. Archives are
+    opened once and are shared. Opened archives are registered (see
+    :func:`register_archive`).
+    """
+    with _archives_lock:
+        if path not in _archives:
+            _archives[path] = ZipArchive(path)
+            _registered.add(path)
+        return _archives[path]
+
+
+def close_archive(path):
+    """Close the archive with passed ``path``, so it is opened again on the
+    next use (e.g. if the archive is replaced). The archive stays registered.
+    """
+    with _archives_lock:
+        archive = _archives.pop(path, None)
+    if archive is not None:
+        archive.close()
+
+
+def get_member(path):
+    """Return a two-tuple with :class:`ZipArchive` and the name of the member
+    for ``path`` inside of the registered archive, or ``None`` for other
+    paths.
+    """
+    if not _registered:
+        return None
+    for archive_path in list(_registered):
+        if path == archive_path:
+            return open_archive(archive_path), ''
+        if path.startswith(archive_path + os.sep):
+            name = path[len(archive_path) + 1:].replace(os.sep, '/')
+            return open_archive(archive_path), name
+    return None
+
+
+def is_archive(path):
+    """Return ``True`` if ``path`` is the path of the registered archive."""
+    return path in _registered
+
+
+def exists(path):
+    """:func:`os.path.exists` that supports paths inside of archives. If the
+    archive isn't registered yet (e.g. when cache entries are checked in
+    another process), it is found by the path and registered.
+    """
+    member = get_member(path)
+    if member is None:
+        if os.path.exists(path):
+            return True
+        member = _find_member(path)
+        if member is None:
+            return False
+    archive, name = member
+    try:
+        archive.stat(name)
+    except OSError:
+        return False
+    return True
+
+
+def stat(path):
+    """:func:`os.stat` that supports paths inside of registered archives."""
+    member = get_member(path)
+    if member is None:
+        return os.stat(path)
+    archive, name = member
+    return archive.stat(name)
+
+
+def scandir(path):
+    """:func:`~gears.utils.scandir` that supports paths inside of registered
+    archives.
+    """
+    member = get_member(path)
+    if member is None:
+        return scandir_directory(path)
+    archive, name = member
+    return archive.scandir(name)
+
+
+def open_file(path):
+    """Open the file with passed ``path`` for reading in binary mode. Members
+    of registered archives are returned as :class:`io.BytesIO` objects.
+    """
+    member = get_member(path)
+    if member is None:
+        return open(path, 'rb')
+    archive, name = member
+    return io.BytesIO(archive.read(name))
+
+
+def read(path):
+    """Return the contents of the file with passed ``path`` as bytes."""
+    member = get_member(path)
+    if member is None:
+        with open(path, 'rb') as f:
+            return f.read()
+    archive, name = member
+    return archive.read(name)
+
+
+def _find_member(path):
+    archive_path = os.path.dirname(path)
+    while not os.path.exists(archive_path):
+        parent = os.path.dirname(archive_path)
+        if parent == archive_path:
+            return None
+        archive_path = parent
+    if not os.path.isfile(archive_path) or not zipfile.is_zipfile(archive_path):
+        return None
+    register_archive(archive_path)
+    return get_member(path)
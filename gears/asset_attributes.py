@@ -2,6 +2,8 @@
 
 import os
 import re
+from . import __version__
+from .cache.keys import get_namespace
 from .utils import cached_property
 
 
@@ -208,3 +210,22 @@ class AssetAttributes(object):
             if mimetype == self.compiler_mimetype:
                 return extension
         return None
+
+    @cached_property
+    def cache_namespace(self):
+        """The fingerprint of Gears version, hash settings of the environment,
+        MIME type and processors of the asset. It is a part of the asset cache
+        keys, so cached results are not used if processors are changed.
+        """
+        return get_namespace([__version__,
+                              self.environment.hash_name,
+                              self.environment.fingerprint_length,
+                              self.mimetype] + self.processors)
+
+    @cached_property
+    def compressed_cache_namespace(self):
+        """The same as :attr:`cache_namespace`, but includes the compressor. It
+        is used for compressed sources only, so other cached results are used
+        if the compressor is changed.
+        """
+        return get_namespace([self.cache_namespace, self.compressor])
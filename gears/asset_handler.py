@@ -16,6 +16,19 @@ class BaseAssetHandler(object):
 
     supports_check_mode = False
 
+    #: The version of the handler. It is a part of cache keys of assets built
+    #: by the handler, so it must be changed when the handler output changes
+    #: (e.g. the wrapped compiler is upgraded).
+    version = None
+
+    def __new__(cls, *args, **kwargs):
+        self = super(BaseAssetHandler, cls).__new__(cls)
+        # Arguments passed to the constructor describe the handler in cache
+        # keys, as attributes of the instance can be changed by its calls.
+        self.initargs = args
+        self.initkwargs = kwargs
+        return self
+
     def __call__(self, asset):
         """Subclasses have to override this method to implement the actual
         handler function code. This method is called with asset as argument.
@@ -38,6 +51,8 @@ class BaseAssetHandler(object):
         def handler(asset, *args, **kwargs):
             return handler.handler_class(**initkwargs)(asset, *args, **kwargs)
         handler.handler_class = cls
+        handler.initkwargs = initkwargs
+        handler.version = cls.version
         handler.supports_check_mode = cls.supports_check_mode
         return handler
 
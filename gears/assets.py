@@ -1,12 +1,19 @@
 import codecs
-import hashlib
 import os
 import re
+import stat
 
+from . import __version__
+from .archives import open_file
 from .asset_attributes import AssetAttributes
+from .cache.base import PrefetchedCache, lock_cache_key
 from .compat import is_py3, str, UnicodeMixin
+from .directives_parser import DirectivesParser
+from .cache.keys import get_namespace
 from .exceptions import GearsUnicodeError
-from .utils import cached_property, unique
+from .utils import cached_property, missing, unique
+
+from glob2.fnmatch import fnmatch
 
 
 EXTENSION_RE = re.compile(r'(\.\w+)$')
@@ -45,11 +52,6 @@ class Requirements(object):
             self.add(self._asset_from_paths(absolute_path, logical_path))
         return self
 
-    @cached_property
-    def expired(self):
-        return (any(asset.bundle_expired for asset in self.before) or
-                any(asset.bundle_expired for asset in self.after))
-
     def add(self, asset):
         if asset is self.asset:
             self.current = self.after
@@ -77,7 +79,7 @@ class Requirements(object):
 
     def _asset_from_paths(self, absolute_path, logical_path):
         attributes = AssetAttributes(self.asset.attributes.environment, logical_path)
-        return Asset(attributes, absolute_path)
+        return Asset(attributes, absolute_path, cache=self.asset.cache)
 
     def _paths_from_asset(self, asset):
         return (asset.absolute_path, asset.attributes.path)
@@ -85,62 +87,161 @@ class Requirements(object):
 
 class Dependency(object):
 
-    def __init__(self, environment, absolute_path):
+    def __init__(self, environment, absolute_path, cache=None):
         self.environment = environment
         self.absolute_path = absolute_path
+        self.cache = cache if cache is not None else environment.cache
         if self.expired:
             self._save_to_cache()
 
     def __eq__(self, other):
-        return self.absolute_path == other.absolute_path
+        return self._get_cache_key() == other._get_cache_key()
 
     def __hash__(self):
-        return hash(self.absolute_path)
+        return hash(self._get_cache_key())
+
+    @cached_property
+    def session(self):
+        return self.environment.session
+
+    @property
+    def item(self):
+        """The value stored in the list of dependencies of the cached asset."""
+        return self.absolute_path
+
+    @cached_property
+    def is_directory(self):
+        return stat.S_ISDIR(self.session.stat(self.absolute_path).st_mode)
 
     @cached_property
     def source(self):
-        if os.path.isdir(self.absolute_path):
-            source = ', '.join(sorted(os.listdir(self.absolute_path)))
+        if self.is_directory:
+            source = ', '.join(self.session.listdir(self.absolute_path))
             return source.encode('utf-8') if is_py3 else source
-        with open(self.absolute_path, 'rb') as f:
-            return f.read()
+        return self.session.read(self.absolute_path)
 
     @cached_property
     def mtime(self):
-        return os.stat(self.absolute_path).st_mtime
+        return self.session.stat(self.absolute_path).st_mtime
 
     @cached_property
     def hexdigest(self):
-        return hashlib.sha1(self.source).hexdigest()
+        if self.is_directory:
+            return self.environment.get_hexdigest(self.source)
+        return self.session.hexdigest(self.absolute_path)
+
+    @cached_property
+    def signature(self):
+        return self.session.signature(self.absolute_path)
 
     @cached_property
     def expired(self):
-        data = self.environment.cache.get(self._get_cache_key())
+        data = self.cache.get(self._get_cache_key())
         return (data is None or
-                self.mtime > data['mtime'] or
-                self.hexdigest > data['hexdigest'])
+                is_changed(self, data, self.environment.verify_sources))
 
     def to_dict(self):
-        return {'mtime': self.mtime, 'hexdigest': self.hexdigest}
+        return {'mtime': self.mtime,
+                'hexdigest': self.hexdigest,
+                'signature': self.signature}
 
     def _save_to_cache(self):
-        self.environment.cache.set(self._get_cache_key(), self.to_dict())
+        self.cache.set(self._get_cache_key(), self.to_dict())
+
+    def _get_cache_key(self):
+        return get_dependency_cache_key(self.absolute_path)
+
+
+class DirectoryDependency(Dependency):
+    """The dependency on the set of files in the directory, that match the
+    basename ``pattern`` (the same way as in
+    :meth:`~gears.environment.Environment.list`) and have the compiled
+    ``mimetype``. It is added by ``require_directory`` and ``require_tree``
+    directives, so adding or removing unrelated files (e.g. images next to
+    scripts) or touching the directory doesn't expire assets that require it.
+    If ``recursive`` is ``True``, names of subdirectories are also taken
+    into account, so new subdirectories of the tree are noticed.
+    """
+
+    def __init__(self, environment, absolute_path, pattern, mimetype=None,
+                 recursive=False, cache=None):
+        self.pattern = pattern
+        self.mimetype = mimetype
+        self.recursive = recursive
+        super(DirectoryDependency, self).__init__(environment, absolute_path, cache)
+
+    @property
+    def item(self):
+        return (self.absolute_path, self.pattern, self.mimetype, self.recursive)
+
+    @cached_property
+    def is_directory(self):
+        return True
+
+    @cached_property
+    def names(self):
+        """The sorted list of names of matching files. Names of
+        subdirectories end with ``/``.
+        """
+        names = []
+        for name, is_directory in self.session.scandir(self.absolute_path):
+            if is_directory:
+                if self.recursive:
+                    names.append(name + '/')
+            elif self._matches(name):
+                names.append(name)
+        return names
+
+    @cached_property
+    def source(self):
+        source = '\n'.join(self.names)
+        return source.encode('utf-8') if is_py3 else source
+
+    @cached_property
+    def mtime(self):
+        # The modification time of the directory is changed by any file, so
+        # it is not used to detect changes.
+        return None
+
+    @cached_property
+    def signature(self):
+        return self.hexdigest
+
+    @cached_property
+    def expired(self):
+        data = self.cache.get(self._get_cache_key())
+        return data is None or data['hexdigest'] != self.hexdigest
+
+    def to_dict(self):
+        return {'hexdigest': self.hexdigest}
+
+    def _matches(self, name):
+        attributes = AssetAttributes(self.environment, name)
+        if self.mimetype is not None and attributes.mimetype != self.mimetype:
+            return False
+        basename = os.path.basename(attributes.path_without_suffix)
+        return fnmatch(basename, self.pattern) or basename == 'index'
 
     def _get_cache_key(self):
-        return 'dependency:%s' % self.absolute_path
+        return get_dependency_cache_key(
+            self.absolute_path, [self.pattern, self.mimetype, self.recursive])
 
 
 class Dependencies(object):
 
-    def __init__(self, environment):
+    def __init__(self, environment, cache=None):
         self.environment = environment
+        self.cache = cache
         self._registry = set()
 
     @classmethod
-    def from_list(cls, environment, data):
-        self = cls(environment)
-        for absolute_path in data:
-            self.add(absolute_path)
+    def from_list(cls, environment, data, cache=None):
+        self = cls(environment, cache)
+        for item in data:
+            if isinstance(item, (list, tuple)):
+                self.add_directory(*item)
+            else:
+                self.add(item)
         return self
 
     @cached_property
@@ -149,18 +250,32 @@ class Dependencies(object):
 
     @cached_property
     def mtime(self):
-        if not self._registry:
+        mtimes = [d.mtime for d in self._registry if d.mtime is not None]
+        if not mtimes:
             return None
-        return max(d.mtime for d in self._registry)
+        return max(mtimes)
+
+    @property
+    def paths(self):
+        """The list of absolute paths of all files and directories."""
+        return list(unique(d.absolute_path for d in self._registry))
 
     def add(self, absolute_path):
-        self._registry.add(Dependency(self.environment, absolute_path))
+        self._registry.add(Dependency(self.environment, absolute_path, self.cache))
+
+    def add_directory(self, absolute_path, pattern, mimetype=None, recursive=False):
+        """Add the dependency on files in the directory, that match
+        ``pattern`` and ``mimetype`` (see :class:`DirectoryDependency`).
+        """
+        self._registry.add(DirectoryDependency(
+            self.environment, absolute_path, pattern, mimetype, recursive,
+            self.cache))
 
     def clear(self):
         self._registry.clear()
 
     def to_list(self):
-        return [d.absolute_path for d in self._registry]
+        return [d.item for d in self._registry]
 
 
 class BaseAsset(object):
@@ -189,10 +304,15 @@ class BaseAsset(object):
     def params(self):
         return {}
 
+    @cached_property
+    def session(self):
+        return self.attributes.environment.session
+
     @cached_property
     def hexdigest_path(self):
+        fingerprint_length = self.attributes.environment.fingerprint_length
         return EXTENSION_RE.sub(
-            r'.{0}\1'.format(self.final_hexdigest),
+            r'.{0}\1'.format(self.final_hexdigest[:fingerprint_length]),
             self.attributes.logical_path,
         )
 
@@ -200,28 +320,48 @@ class BaseAsset(object):
 class Asset(UnicodeMixin, BaseAsset):
 
     def __init__(self, *args, **kwargs):
+        cache = kwargs.pop('cache', None)
         super(Asset, self).__init__(*args, **kwargs)
-        self.cache = self.attributes.environment.cache
+        self._cached_data = missing
+        if cache is None:
+            # Cached data of all requirements of the bundle and their
+            # dependencies are read in a few batches instead of one by one.
+            # Requirements share the prefetched cache with the asset.
+            cache = PrefetchedCache(self.attributes.environment.cache)
+            prefetch_bundle(cache, self.attributes, self.absolute_path)
+        self.cache = cache
+        # If the cache supports locking, other processes wait while the asset
+        # is built, and then take it from the cache instead of building it too.
+        # The lock is taken only if the asset is expired, and the cache is
+        # checked again under the lock.
         if self.expired:
-            self.params.clear()
-            self.dependencies.clear()
-            self.requirements = Requirements(self)
-            self.processed_source = self.source
-            for process in self.attributes.processors:
-                process(self)
-            self._save_to_cache()
-        else:
-            self._init_from_cache()
+            with lock_cache_key(self.cache, self._get_cache_key()):
+                self._reset_cached_data()
+                if self.expired:
+                    self.params.clear()
+                    self.dependencies.clear()
+                    self.requirements = Requirements(self)
+                    self.processed_source = self.source
+                    for process in self.attributes.processors:
+                        process(self)
+                    self._save_to_cache()
+                    return
+        self._init_from_cache()
 
     def __unicode__(self):
         return self.compressed_source
 
     def __iter__(self):
-        return iter(str(self).encode('utf-8'))
+        return iter(self.encoded_source)
 
     @property
     def cached_data(self):
-        return self.cache.get(self._get_cache_key())
+        """The data of the asset from the cache. It is read only once, until
+        the asset is saved to the cache again.
+        """
+        if self._cached_data is missing:
+            self._cached_data = self.cache.get(self._get_cache_key())
+        return self._cached_data
 
     @cached_property
     def params(self):
@@ -233,67 +373,99 @@ class Asset(UnicodeMixin, BaseAsset):
     def dependencies(self):
         if self.cached_data:
             data = self.cached_data['dependencies']
-            return Dependencies.from_list(self.attributes.environment, data)
-        return Dependencies(self.attributes.environment)
+            return Dependencies.from_list(self.attributes.environment, data, self.cache)
+        return Dependencies(self.attributes.environment, self.cache)
 
     @cached_property
     def source(self):
+        source = self.session.read(self.absolute_path)
         try:
-            with codecs.open(self.absolute_path, encoding='utf-8') as f:
-                return f.read()
+            return source.decode('utf-8')
         except UnicodeDecodeError as e:
             raise GearsUnicodeError(self.absolute_path, str(e))
 
     @cached_property
     def bundled_source(self):
         cache_key = self._get_cache_key('bundled_source')
-        if not self.bundle_expired:
-            bundled_source = self.cache.get(cache_key)
-            if bundled_source is not None:
-                return bundled_source
+        data = self.cache.get(cache_key)
+        if data is not None and data['signature'] == self.bundle_signature:
+            return data['source']
         bundled_source = '\n'.join(r.processed_source for r in self.requirements)
-        self.cache.set(cache_key, bundled_source)
+        self.cache.set(cache_key, {'signature': self.bundle_signature,
+                                   'source': bundled_source})
         return bundled_source
 
     @cached_property
     def compressed_source(self):
         cache_key = self._get_cache_key('compressed_source')
-        if not self.bundle_expired:
-            compressed_source = self.cache.get(cache_key)
-            if compressed_source is not None:
-                return compressed_source
+        data = self.cache.get(cache_key)
+        if data is not None and data['signature'] == self.bundle_signature:
+            return data['source']
         compressed_source = self.bundled_source
         compress = self.attributes.compressor
         if compress:
             compressed_source = compress(self)
-        self.cache.set(cache_key, compressed_source)
+        self.cache.set(cache_key, {'signature': self.bundle_signature,
+                                   'source': compressed_source})
         return compressed_source
 
     @cached_property
     def mtime(self):
-        mtime = os.stat(self.absolute_path).st_mtime
+        mtime = self.session.stat(self.absolute_path).st_mtime
         if self.dependencies.mtime is not None:
             return max(mtime, self.dependencies.mtime)
         return mtime
 
     @cached_property
     def hexdigest(self):
-        return hashlib.sha1(self.source.encode('utf-8')).hexdigest()
+        environment = self.attributes.environment
+        return environment.get_hexdigest(self.source.encode('utf-8'))
+
+    @cached_property
+    def encoded_source(self):
+        return self.compressed_source.encode('utf-8')
 
     @cached_property
     def final_hexdigest(self):
-        return hashlib.sha1(self.compressed_source.encode('utf-8')).hexdigest()
+        return self.attributes.environment.get_hexdigest(self.encoded_source)
+
+    @cached_property
+    def signature(self):
+        return self.session.signature(self.absolute_path)
 
     @cached_property
     def expired(self):
         return (self.cached_data is None or
-                self.mtime > self.cached_data['mtime'] or
-                self.hexdigest > self.cached_data['hexdigest'] or
+                is_changed(self, self.cached_data,
+                           self.attributes.environment.verify_sources) or
                 self.dependencies.expired)
 
     @cached_property
-    def bundle_expired(self):
-        return self.expired or self.requirements.expired
+    def processed_hexdigest(self):
+        environment = self.attributes.environment
+        return environment.get_hexdigest(self.processed_source.encode('utf-8'))
+
+    @cached_property
+    def bundle_signature(self):
+        """The list of absolute paths and hexdigests of processed sources of
+        all requirements of the bundle. Cached bundled and compressed sources
+        are used only if it is not changed, so the bundle is rebuilt even if
+        its changed requirement was already saved to the cache by another
+        bundle.
+        """
+        return [[r.absolute_path, r.processed_hexdigest] for r in self.requirements]
+
+    @cached_property
+    def source_paths(self):
+        """The list of absolute paths of all files and directories the bundle
+        is built from: the asset itself, its requirements and their
+        dependencies.
+        """
+        paths = []
+        for requirement in self.requirements:
+            paths.append(requirement.absolute_path)
+            paths.extend(requirement.dependencies.paths)
+        return sorted(set(paths))
 
     def to_dict(self):
         return {'processed_source': self.processed_source,
@@ -301,21 +473,35 @@ class Asset(UnicodeMixin, BaseAsset):
                 'dependencies': self.dependencies.to_list(),
                 'params': self.params,
                 'hexdigest': self.hexdigest,
+                'processed_hexdigest': self.processed_hexdigest,
+                'signature': self.signature,
                 'mtime': self.mtime}
 
     def _init_from_cache(self):
         self.params = self.cached_data['params']
         self.dependencies = Dependencies.from_list(
             self.attributes.environment,
-            self.cached_data['dependencies'])
+            self.cached_data['dependencies'],
+            self.cache)
         self.requirements = Requirements.from_dict(self, self.cached_data['requirements'])
         self.processed_source = self.cached_data['processed_source']
+        self.processed_hexdigest = self.cached_data['processed_hexdigest']
 
     def _save_to_cache(self):
         self.cache.set(self._get_cache_key(), self.to_dict())
+        self._cached_data = missing
+
+    def _reset_cached_data(self):
+        self._cached_data = missing
+        for name in ('expired', 'params', 'dependencies'):
+            self.__dict__.pop(name, None)
 
     def _get_cache_key(self, suffix='data'):
-        return 'asset:%s:%s' % (self.absolute_path, suffix)
+        if suffix == 'compressed_source':
+            namespace = self.attributes.compressed_cache_namespace
+        else:
+            namespace = self.attributes.cache_namespace
+        return get_cache_key(self.absolute_path, suffix, namespace)
 
 
 class StaticAsset(BaseAsset):
@@ -324,45 +510,82 @@ class StaticAsset(BaseAsset):
 
     @cached_property
     def source(self):
-        with open(self.absolute_path, 'rb') as f:
-            return f.read()
+        return self.session.read(self.absolute_path)
 
     @cached_property
     def mtime(self):
-        return os.stat(self.absolute_path).st_mtime
+        return self.session.stat(self.absolute_path).st_mtime
 
     @cached_property
     def hexdigest(self):
-        return hashlib.sha1(self.source).hexdigest()
+        return self.session.hexdigest(self.absolute_path)
 
     @cached_property
     def final_hexdigest(self):
         return self.hexdigest
 
+    @property
+    def encoded_source(self):
+        return self.source
+
+    @property
+    def source_paths(self):
+        return [self.absolute_path]
+
     def __iter__(self):
         return iter(self.source)
 
 
 class CheckAsset(BaseAsset):
+    """The asset used to get asset params (e.g. to check if it is public)
+    without building it. Only the header of the source is read, and only
+    processors supporting check mode are called. The params and
+    :attr:`required_paths` are cached until the source file is changed.
+    """
 
     def __init__(self, *args, **kwargs):
         super(CheckAsset, self).__init__(*args, **kwargs)
+        self.cache = self.attributes.environment.cache
+
+        #: Normalized paths from ``require``, ``require_directory`` and
+        #: ``require_tree`` directives, which are not resolved in check mode.
+        self.required_paths = []
+
+        data = self.cache.get(self._get_cache_key())
+        if (data is not None and data['signature'] == self.signature and
+                'required_paths' in data):
+            self.params = data['params']
+            self.required_paths = data['required_paths']
+            return
         self.processed_source = self.source
         for process in self.attributes.processors:
             if getattr(process, 'supports_check_mode', False):
                 process(self, check=True)
+        self.cache.set(self._get_cache_key(), {
+            'signature': self.signature,
+            'params': self.params,
+            'required_paths': self.required_paths,
+        })
 
     @cached_property
     def source(self):
         try:
-            with codecs.open(self.absolute_path, encoding='utf-8') as f:
-                return f.read()
+            with open_file(self.absolute_path) as f:
+                return DirectivesParser().read_header(codecs.getreader('utf-8')(f))
         except UnicodeDecodeError as e:
             raise GearsUnicodeError(self.absolute_path, str(e))
 
+    @cached_property
+    def signature(self):
+        return self.session.signature(self.absolute_path)
+
+    def _get_cache_key(self):
+        return get_cache_key(self.absolute_path, 'check',
+                             self.attributes.cache_namespace)
+
 
 def build_asset(environment, path, check=False):
-    path = strip_fingerprint(path)
+    path = strip_fingerprint(path, environment.fingerprint_length)
     asset_attributes = AssetAttributes(environment, path)
     asset_attributes, absolute_path = environment.find(asset_attributes, True)
     if not asset_attributes.processors:
@@ -372,8 +595,75 @@ def build_asset(environment, path, check=False):
     return Asset(asset_attributes, absolute_path)
 
 
-def strip_fingerprint(path):
-    match = FINGERPRINT_RE.search(path)
+def is_changed(source, data, strict=False):
+    """Return ``True`` if the file of ``source`` (an asset or a dependency) is
+    changed since ``data`` was saved to the cache. If the stat signature of
+    the file is not changed, the file is not read, unless ``strict`` is
+    ``True``.
+    """
+    if not strict and source.signature == data.get('signature'):
+        return False
+    return source.mtime > data['mtime'] or source.hexdigest != data['hexdigest']
+
+
+def get_cache_key(absolute_path, suffix='data', namespace=None):
+    """Return the cache key of the asset. ``namespace`` is usually
+    :attr:`~gears.asset_attributes.AssetAttributes.cache_namespace` of the
+    asset.
+    """
+    if namespace is None:
+        return 'asset:%s:%s' % (absolute_path, suffix)
+    return 'asset:%s:%s:%s' % (namespace, absolute_path, suffix)
+
+
+def get_dependency_cache_key(absolute_path, scope=None):
+    if scope is None:
+        return 'dependency:%s:%s' % (__version__, absolute_path)
+    return 'dependency:%s:%s:%s' % (__version__, get_namespace(scope), absolute_path)
+
+
+def prefetch_bundle(cache, attributes, absolute_path):
+    """Read cached data and compressed source of the asset, data of all its
+    requirements and their dependencies to
+    :class:`~gears.cache.base.PrefetchedCache` ``cache``. Data of each level
+    of requirements is read in one batch, together with dependencies of the
+    previous level.
+    """
+    environment = attributes.environment
+    assets = [(attributes, absolute_path)]
+    seen = set([absolute_path])
+    dependency_keys = [get_cache_key(absolute_path, 'compressed_source',
+                                     attributes.compressed_cache_namespace)]
+    while assets or dependency_keys:
+        keys = [get_cache_key(path, namespace=asset_attributes.cache_namespace)
+                for asset_attributes, path in assets]
+        cache.prefetch(keys + dependency_keys)
+        assets, dependency_keys = [], []
+        for key in keys:
+            data = cache.get(key)
+            if data is None:
+                continue
+            for item in data['dependencies']:
+                if isinstance(item, (list, tuple)):
+                    dependency_keys.append(get_dependency_cache_key(item[0], list(item[1:])))
+                else:
+                    dependency_keys.append(get_dependency_cache_key(item))
+            requirements = data['requirements']
+            for path, logical_path in requirements['before'] + requirements['after']:
+                if path not in seen:
+                    seen.add(path)
+                    assets.append((AssetAttributes(environment, logical_path), path))
+
+
+def strip_fingerprint(path, fingerprint_length=40):
+    """Remove the fingerprint of ``fingerprint_length`` hex digits from the
+    fingerprinted ``path``.
+    """
+    if fingerprint_length == 40:
+        regex = FINGERPRINT_RE
+    else:
+        regex = re.compile(r'(\.[0-9a-f]{%d})\.\w+$' % fingerprint_length)
+    match = regex.search(path)
     if not match:
         return path
     fingerprint = match.group(1)
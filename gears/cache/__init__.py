@@ -0,0 +1,8 @@
+from .compressed import CompressedCache
+from .file_based import FileBasedCache
+from .memcached import MemcachedCache
+from .memory import MemoryCache
+from .simple import SimpleCache
+from .sqlite import SQLiteCache
+from .stats import CacheStats, StatsCache
+from .tiered import TieredCache
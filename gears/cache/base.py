@@ -0,0 +1,100 @@
+from contextlib import contextmanager
+
+from ..utils import unique
+
+
+@contextmanager
+def lock_cache_key(cache, key):
+    """Hold the lock for ``key`` in the context, if ``cache`` supports
+    locking (see :meth:`~gears.cache.FileBasedCache.lock`).
+    """
+    lock = getattr(cache, 'lock', None)
+    if lock is None:
+        yield
+        return
+    with lock(key):
+        yield
+
+
+def get_many(cache, keys):
+    """Return a dict with values of found ``keys``. The ``get_many`` method of
+    the cache is used if it exists, so all values are read at once (e.g. in
+    one query or one network round trip), otherwise keys are read one by one.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+    method = getattr(cache, 'get_many', None)
+    if method is not None:
+        return method(keys)
+    values = {}
+    for key in keys:
+        value = cache.get(key)
+        if value is not None:
+            values[key] = value
+    return values
+
+
+def set_many(cache, mapping):
+    """Save all key/value pairs from ``mapping`` using ``set_many`` method of
+    the cache if it exists, or one by one otherwise.
+    """
+    if not mapping:
+        return
+    method = getattr(cache, 'set_many', None)
+    if method is not None:
+        method(mapping)
+        return
+    for key, value in mapping.items():
+        cache.set(key, value)
+
+
+class PrefetchedCache(object):
+    """The wrapper that serves values of ``keys``, read from the ``cache`` by
+    one :func:`get_many` call, without reading them again. Keys that were not
+    found are remembered as misses. It is used to load all cached
+    requirements of the bundle at once.
+    """
+
+    def __init__(self, cache, keys=()):
+        self.cache = cache
+        self.values = {}
+        self.prefetch(keys)
+
+    def prefetch(self, keys):
+        """Read values of ``keys`` that are not prefetched yet in one batch,
+        and return a dict with found ones.
+        """
+        keys = [key for key in unique(keys) if key not in self.values]
+        values = get_many(self.cache, keys)
+        self.values.update(dict.fromkeys(keys))
+        self.values.update(values)
+        return values
+
+    def get(self, key):
+        if key in self.values:
+            return self.values[key]
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.values.pop(key, None)
+        self.cache.set(key, value)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        self.prefetch(keys)
+        return dict((key, self.values[key]) for key in keys
+                    if self.values[key] is not None)
+
+    def set_many(self, mapping):
+        for key in mapping:
+            self.values.pop(key, None)
+        set_many(self.cache, mapping)
+
+    @contextmanager
+    def lock(self, key):
+        with lock_cache_key(self.cache, key):
+            # The entry could be saved by the process that held the lock, so
+            # the prefetched value is not trusted.
+            self.values.pop(key, None)
+            yield
@@ -0,0 +1,113 @@
+import threading
+import zlib
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import lzma
+except ImportError:
+    lzma_available = False
+else:
+    lzma_available = True
+
+from ..exceptions import ImproperlyConfigured
+from .base import get_many, lock_cache_key, set_many
+
+
+class CompressedValue(object):
+    """The compressed pickle of the value stored by :class:`CompressedCache`."""
+
+    def __init__(self, method, data):
+        self.method = method
+        self.data = data
+
+
+class CompressedCache(object):
+    """The wrapper that compresses values of the ``cache`` (e.g.
+    :class:`~gears.cache.FileBasedCache`) that are larger than ``threshold``
+    bytes after pickling. Smaller values are stored unchanged.
+
+    Sizes of compressed values before and after compression are summed in
+    :attr:`original_size` and :attr:`compressed_size`, so the achieved
+    :attr:`ratio` can be reported.
+
+    :param cache: the wrapped cache.
+    :param threshold: the minimum size in bytes of the pickled value to
+                      compress.
+    :param method: ``'zlib'`` or ``'lzma'``. lzma compresses better, but is
+                   slower. On Python 2 it requires ``backports.lzma``.
+    :param level: the compression level. Defaults to 6 for both methods.
+    """
+
+    def __init__(self, cache, threshold=1024, method='zlib', level=6):
+        if method == 'lzma' and not lzma_available:
+            raise ImproperlyConfigured('lzma is not available')
+        if method not in ('zlib', 'lzma'):
+            raise ImproperlyConfigured('Unknown compression method: %s' % method)
+        self.cache = cache
+        self.threshold = threshold
+        self.method = method
+        self.level = level
+        #: The total size in bytes of compressed values before compression.
+        self.original_size = 0
+        #: The total size in bytes of compressed values after compression.
+        self.compressed_size = 0
+        self._lock = threading.Lock()
+
+    @property
+    def ratio(self):
+        """The ratio of :attr:`original_size` to :attr:`compressed_size`, or
+        ``None`` if nothing is compressed yet.
+        """
+        if not self.compressed_size:
+            return None
+        return float(self.original_size) / self.compressed_size
+
+    def set(self, key, value):
+        self.cache.set(key, self.compress(value))
+
+    def get(self, key):
+        return self.decompress(self.cache.get(key))
+
+    def set_many(self, mapping):
+        set_many(self.cache, dict((key, self.compress(value))
+                                  for key, value in mapping.items()))
+
+    def get_many(self, keys):
+        values = {}
+        for key, value in get_many(self.cache, keys).items():
+            value = self.decompress(value)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def lock(self, key):
+        return lock_cache_key(self.cache, key)
+
+    def compress(self, value):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) < self.threshold:
+            return value
+        if self.method == 'lzma':
+            compressed_data = lzma.compress(data, preset=self.level)
+        else:
+            compressed_data = zlib.compress(data, self.level)
+        with self._lock:
+            self.original_size += len(data)
+            self.compressed_size += len(compressed_data)
+        return CompressedValue(self.method, compressed_data)
+
+    def decompress(self, value):
+        if not isinstance(value, CompressedValue):
+            return value
+        try:
+            if value.method == 'lzma':
+                data = lzma.decompress(value.data)
+            else:
+                data = zlib.decompress(value.data)
+            return pickle.loads(data)
+        except Exception:
+            # Treat corrupted entries as missing, so assets are rebuilt.
+            return None
@@ -0,0 +1,266 @@
+import errno
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from ..archives import exists
+from ..compat import replace
+from .keys import get_key_path
+
+
+class FileBasedCache(object):
+    """The cache that stores each entry in a separate file in ``root``
+    directory. Entries are written to temporary files that are then renamed,
+    so readers in other processes never see partially written entries.
+
+    :param root: the path to the cache directory.
+    :param locking: if set to ``True``, assets lock their cache entries while
+                    they are built (using advisory file locks), so several
+                    processes warming the same cache don't build the same
+                    assets. Locking is not supported on Windows.
+    :param lock_timeout: the time in seconds to wait for the lock. If it
+                         expires, the asset is built without the lock.
+    :param max_size: the maximum size of the cache in bytes. If it is
+                     exceeded, least recently used entries are removed by
+                     :meth:`prune`. Entries are touched on every read, so their
+                     modification times are used as access times. The size
+                     of the cache is stored in the ``.size`` file in ``root``
+                     directory and is updated by every write, so processes
+                     don't have to walk the cache to find it out.
+    """
+
+    #: If ``max_size`` is exceeded, least recently used entries are removed
+    #: until the cache takes this part of ``max_size``, so the cache is not
+    #: pruned on every write.
+    prune_to = 0.8
+
+    def __init__(self, root, locking=False, lock_timeout=60, max_size=None):
+        self.root = root
+        self.locking = locking
+        self.lock_timeout = lock_timeout
+        self.max_size = max_size
+
+    def set(self, key, value):
+        filepath = self._get_filepath(key)
+
+        dirname = os.path.dirname(filepath)
+        if not self._makedirs(dirname):
+            return
+
+        try:
+            fd, temp_filepath = tempfile.mkstemp(dir=dirname, prefix='.', suffix='.tmp')
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # The key is saved before the value, so it can be read by
+                # prune without loading the value.
+                pickle.dump(key, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            replace(temp_filepath, filepath)
+        except (IOError, OSError):
+            return
+        finally:
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+        if self.max_size is not None:
+            self._add_size(size)
+
+    def get(self, key):
+        filepath = self._get_filepath(key)
+        try:
+            with open(filepath, 'rb') as f:
+                if pickle.load(f) != key:
+                    return None
+                value = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.PickleError):
+            return None
+        if self.max_size is not None:
+            try:
+                os.utime(filepath, None)
+            except OSError:
+                pass
+        return value
+
+    def delete(self, key):
+        self._remove(self._get_filepath(key))
+
+    def prune(self, max_size=None, remove_missing=False):
+        """Remove least recently used entries until the cache takes no more
+        than ``max_size`` bytes. If ``remove_missing`` is ``True``, entries of
+        assets and dependencies whose files no longer exist and unreadable
+        entries are removed too. Lock files of removed entries are removed if
+        they are not locked. Returns the number of removed entries.
+        """
+        removed = 0
+        entries = []
+        locks = []
+        for filepath, stat in self._iter_entries(locks):
+            if remove_missing and self._is_missing(filepath):
+                removed += self._remove(filepath)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, filepath))
+        size = sum(entry_size for mtime, entry_size, filepath in entries)
+        if max_size is not None:
+            entries.sort()
+            for index, (mtime, entry_size, filepath) in enumerate(entries):
+                if size <= max_size:
+                    entries = entries[index:]
+                    break
+                removed += self._remove(filepath)
+                size -= entry_size
+            else:
+                entries = []
+        if self.max_size is not None:
+            self._write_size(size)
+        filepaths = set(filepath for mtime, entry_size, filepath in entries)
+        for filepath in locks:
+            if filepath[:-5] not in filepaths:
+                self._remove_lock(filepath)
+        return removed
+
+    def get_size(self):
+        """Return the total size of cache entries in bytes."""
+        return sum(stat.st_size for filepath, stat in self._iter_entries())
+
+    @contextmanager
+    def lock(self, key):
+        """Hold an exclusive lock for ``key`` in the context. If locking is
+        disabled or is not supported, nothing happens.
+        """
+        if not self.locking or fcntl is None:
+            yield
+            return
+        filepath = self._get_filepath(key) + '.lock'
+        if not self._makedirs(os.path.dirname(filepath)):
+            yield
+            return
+        with open(filepath, 'a') as f:
+            locked = self._acquire(f.fileno())
+            try:
+                yield
+            finally:
+                if locked:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _acquire(self, fd):
+        # flock is used instead of lockf, as its locks are held by open
+        # files, not by processes, so they work for threads too.
+        deadline = time.time() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except (IOError, OSError) as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    return False
+            if time.time() >= deadline:
+                return False
+            time.sleep(0.01)
+
+    def _add_size(self, size):
+        # The size is only approximate (e.g. replaced entries are counted
+        # twice, and concurrent writes can be lost), and is recalculated by
+        # prune. The cache is walked only if the size is not stored yet.
+        total_size = self._read_size()
+        if total_size is None:
+            total_size = self.get_size()
+        else:
+            total_size += size
+        self._write_size(total_size)
+        if total_size > self.max_size:
+            self.prune(int(self.max_size * self.prune_to))
+
+    def _read_size(self):
+        try:
+            with open(self._get_size_filepath()) as f:
+                return int(f.read())
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_size(self, size):
+        filepath = self._get_size_filepath()
+        try:
+            fd, temp_filepath = tempfile.mkstemp(dir=self.root, prefix='.', suffix='.tmp')
+        except (IOError, OSError):
+            return
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(str(size))
+            replace(temp_filepath, filepath)
+        except (IOError, OSError):
+            pass
+        finally:
+            if os.path.exists(temp_filepath):
+                os.remove(temp_filepath)
+
+    def _iter_entries(self, locks=None):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                # Skip temporary files and the size file.
+                if filename.startswith('.'):
+                    continue
+                filepath = os.path.join(dirpath, filename)
+                if filename.endswith('.lock'):
+                    if locks is not None:
+                        locks.append(filepath)
+                    continue
+                try:
+                    yield filepath, os.stat(filepath)
+                except OSError:
+                    continue
+
+    def _remove_lock(self, filepath):
+        if fcntl is None:
+            return
+        # The lock file is removed while it is locked, so it isn't removed
+        # while the entry is built by another process.
+        try:
+            with open(filepath, 'a') as f:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._remove(filepath)
+        except (IOError, OSError):
+            pass
+
+    def _is_missing(self, filepath):
+        try:
+            with open(filepath, 'rb') as f:
+                key = pickle.load(f)
+            path = get_key_path(key)
+        except (IOError, OSError, EOFError, TypeError, pickle.PickleError):
+            return True
+        return path is not None and not exists(path)
+
+    def _remove(self, filepath):
+        try:
+            os.remove(filepath)
+        except OSError:
+            return 0
+        return 1
+
+    def _makedirs(self, dirname):
+        if not os.path.exists(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                return os.path.isdir(dirname)
+        return True
+
+    def _get_size_filepath(self):
+        return os.path.join(self.root, '.size')
+
+    def _get_filepath(self, key):
+        relpath = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        relpath = os.path.join(relpath[:2], relpath[2:4], relpath[4:])
+        return os.path.join(self.root, relpath)
@@ -0,0 +1,91 @@
+import hashlib
+import re
+import types
+
+
+ASSET_FAMILIES = ('data', 'bundled_source', 'compressed_source', 'check')
+
+NAMESPACE_LENGTH = 12
+
+ASSET_KEY_RE = re.compile(r'^asset:(?:[0-9a-f]{%d}:)?(.+):[^:]+$' % NAMESPACE_LENGTH)
+DEPENDENCY_KEY_RE = re.compile(
+    r'^dependency:[^:]*:(?:[0-9a-f]{%d}:)?(.+)$' % NAMESPACE_LENGTH)
+
+SIMPLE_TYPES = (type(None), bool, int, float, type(''), type(u''))
+
+
+def get_key_family(key):
+    """Return the family of the cache ``key``: ``'data'``,
+    ``'bundled_source'``, ``'compressed_source'`` and ``'check'`` for asset
+    keys, ``'dependency'`` for dependency keys, and ``'other'`` for everything
+    else.
+    """
+    kind, sep, rest = key.partition(':')
+    if kind == 'asset':
+        family = rest.rpartition(':')[2]
+        if family in ASSET_FAMILIES:
+            return family
+    elif kind == 'dependency':
+        return 'dependency'
+    return 'other'
+
+
+def get_key_path(key):
+    """Return the absolute path of the asset or the dependency the cache
+    ``key`` belongs to, or ``None`` for other keys.
+    """
+    for regex in (ASSET_KEY_RE, DEPENDENCY_KEY_RE):
+        match = regex.match(key)
+        if match:
+            return match.group(1)
+    return None
+
+
+def get_namespace(items):
+    """Return a short fingerprint of ``items``, a list of strings and asset
+    handlers (compilers, processors and compressors). It is included in cache
+    keys, so entries built with other handlers are not used.
+
+    Handlers are described by their classes (or functions), ``version``
+    attributes, and options passed to their constructors (or to
+    :meth:`~gears.asset_handler.BaseAssetHandler.as_handler`), but not by
+    other attributes, which can be changed by calls of the handler. Other
+    objects (e.g. precompressors) are described by their attributes. So
+    increase ``version`` of the handler when its output is changed.
+    """
+    description = repr([describe_handler(item) for item in items])
+    hexdigest = hashlib.sha1(description.encode('utf-8')).hexdigest()
+    return hexdigest[:NAMESPACE_LENGTH]
+
+
+def describe_handler(handler):
+    if isinstance(handler, SIMPLE_TYPES):
+        return handler
+    handler_class = getattr(handler, 'handler_class', None)
+    if handler_class is not None:
+        options = getattr(handler, 'initkwargs', {})
+    elif isinstance(handler, (type, types.FunctionType, types.BuiltinFunctionType)):
+        handler_class, options = handler, {}
+    elif hasattr(handler, 'initkwargs'):
+        handler_class = type(handler)
+        options = [handler.initargs, handler.initkwargs]
+    else:
+        handler_class, options = type(handler), vars(handler)
+    return (get_name(handler_class),
+            describe_value(getattr(handler, 'version', None)),
+            describe_value(options))
+
+
+def describe_value(value):
+    if isinstance(value, SIMPLE_TYPES):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [describe_value(item) for item in value]
+    if isinstance(value, dict):
+        return sorted((str(k), describe_value(v)) for k, v in value.items())
+    # Reprs of other objects can contain their addresses in memory.
+    return get_name(type(value))
+
+
+def get_name(obj):
+    return '%s.%s' % (obj.__module__, obj.__name__)
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import socket
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Connection(object):
+
+    def __init__(self, address, timeout):
+        self.pid = os.getpid()
+        self.socket = socket.create_connection(address, timeout)
+        self.file = self.socket.makefile('rb')
+
+    def send(self, data):
+        self.socket.sendall(data)
+
+    def readline(self):
+        line = self.file.readline()
+        if not line.endswith(b'\r\n'):
+            raise ProtocolError('Connection closed')
+        return line[:-2]
+
+    def read(self, size):
+        data = self.file.read(size + 2)
+        if len(data) != size + 2 or not data.endswith(b'\r\n'):
+            raise ProtocolError('Connection closed')
+        return data[:-2]
+
+    def close(self):
+        try:
+            self.file.close()
+            self.socket.close()
+        except (IOError, OSError):
+            pass
+
+
+class MemcachedCache(object):
+    """The cache that stores entries on the server that speaks memcached text
+    protocol, so it can be shared by many machines. It can be a memcached
+    server, or :class:`~gears.cache.server.CacheServer`.
+
+    Connections are kept in a pool and are reused. If the server doesn't
+    respond in ``timeout`` seconds or fails, the entry is considered missing,
+    and the connection is dropped. :meth:`get_many` reads all entries at once,
+    sending many keys in one ``get`` command.
+
+    :param address: the two-tuple with host and port of the server.
+    :param timeout: the timeout in seconds for connecting and each operation.
+    :param max_connections: the maximum number of idle connections kept in the
+                            pool.
+    :param prefix: the prefix of keys on the server, so the server can be
+                   shared by several projects.
+    """
+
+    #: The maximum number of keys in one ``get`` command.
+    chunk_size = 100
+
+    #: Values larger than this (in bytes after pickling) are not saved, as
+    #: memcached refuses them by default.
+    max_value_size = 1024 * 1024
+
+    def __init__(self, address=('127.0.0.1', 11211), timeout=1,
+                 max_connections=8, prefix='gears'):
+        self.address = address
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.prefix = prefix
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, mapping):
+        """Save all key/value pairs from ``mapping``. All commands are sent at
+        once, and then all replies are read.
+        """
+        commands = []
+        for key, value in mapping.items():
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_value_size:
+                continue
+            header = 'set %s 0 0 %d\r\n' % (self._make_key(key), len(data))
+            commands.append(header.encode('ascii') + data + b'\r\n')
+        if not commands:
+            return
+
+        def execute(connection):
+            connection.send(b''.join(commands))
+            for command in commands:
+                connection.readline()
+
+        self._execute(execute)
+
+    def get_many(self, keys):
+        """Return a dict with values for found ``keys``. Keys that are not
+        found are missing from the result.
+        """
+        server_keys = dict((self._make_key(key), key) for key in keys)
+        if not server_keys:
+            return {}
+        chunks = list(server_keys)
+        chunks = [chunks[i:i + self.chunk_size]
+                  for i in range(0, len(chunks), self.chunk_size)]
+        result = {}
+
+        def execute(connection):
+            connection.send(b''.join(
+                ('get %s\r\n' % ' '.join(chunk)).encode('ascii') for chunk in chunks))
+            for chunk in chunks:
+                for server_key, data in self._read_values(connection):
+                    if server_key not in server_keys:
+                        continue
+                    try:
+                        result[server_keys[server_key]] = pickle.loads(data)
+                    except Exception:
+                        continue
+
+        # If the server fails, entries read before the failure are returned.
+        self._execute(execute)
+        return result
+
+    def delete(self, key):
+        command = ('delete %s\r\n' % self._make_key(key)).encode('ascii')
+
+        def execute(connection):
+            connection.send(command)
+            connection.readline()
+
+        self._execute(execute)
+
+    def _execute(self, func):
+        try:
+            connection = self._acquire()
+        except (socket.error, IOError, OSError):
+            return
+        try:
+            func(connection)
+        except (socket.error, IOError, OSError, ProtocolError, ValueError):
+            # The connection is in unknown state, so it is not reused.
+            connection.close()
+        else:
+            self._release(connection)
+
+    def _acquire(self):
+        with self._lock:
+            # Connections inherited from the parent process are not used.
+            self._connections = [c for c in self._connections if c.pid == os.getpid()]
+            if self._connections:
+                return self._connections.pop()
+        return Connection(self.address, self.timeout)
+
+    def _release(self, connection):
+        with self._lock:
+            if len(self._connections) < self.max_connections:
+                self._connections.append(connection)
+                return
+        connection.close()
+
+    def _read_values(self, connection):
+        while True:
+            line = connection.readline()
+            if line == b'END':
+                return
+            parts = line.split()
+            if len(parts) != 4 or parts[0] != b'VALUE':
+                raise ProtocolError(line)
+            yield parts[1].decode('ascii'), connection.read(int(parts[3]))
+
+    def _make_key(self, key):
+        # Memcached keys can't be longer than 250 characters and can't
+        # contain spaces.
+        return '%s:%s' % (self.prefix, hashlib.sha1(key.encode('utf-8')).hexdigest())
@@ -0,0 +1,91 @@
+import sys
+import threading
+from collections import OrderedDict
+
+from .keys import get_key_family
+
+
+def get_size(value):
+    """Return approximate size of ``value`` in memory, in bytes. Sizes of
+    items of dicts, lists and tuples are included, so the size of asset data is
+    dominated by the size of its processed source.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(get_size(k) + get_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(get_size(item) for item in value)
+    return size
+
+
+class MemoryCache(object):
+    """In-memory cache with a limited size. Keys are split into families (see
+    :func:`~gears.cache.keys.get_key_family`), and each family has its own
+    budget in bytes. If the budget is exceeded, least recently used entries of
+    the family are evicted.
+
+    :param max_size: the total budget in bytes. It is split between families
+                     according to :attr:`shares`.
+    :param budgets: a dict with budgets in bytes for some families, that
+                    overrides budgets calculated from ``max_size``.
+    """
+
+    #: Shares of ``max_size`` for key families.
+    shares = {
+        'data': 0.4,
+        'bundled_source': 0.2,
+        'compressed_source': 0.3,
+        'dependency': 0.05,
+        'check': 0.025,
+        'other': 0.025,
+    }
+
+    def __init__(self, max_size=64 * 1024 * 1024, budgets=None):
+        self.budgets = dict((family, int(max_size * share))
+                            for family, share in self.shares.items())
+        if budgets:
+            self.budgets.update(budgets)
+        self.sizes = dict((family, 0) for family in self.budgets)
+        self._entries = dict((family, OrderedDict()) for family in self.budgets)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def set(self, key, value):
+        family = get_key_family(key)
+        size = get_size(value)
+        with self._lock:
+            self._delete(family, key)
+            if size > self.budgets[family]:
+                return
+            entries = self._entries[family]
+            entries[key] = (value, size)
+            self.sizes[family] += size
+            while self.sizes[family] > self.budgets[family]:
+                self._delete(family, next(iter(entries)))
+
+    def get(self, key):
+        family = get_key_family(key)
+        with self._lock:
+            entries = self._entries[family]
+            entry = entries.pop(key, None)
+            if entry is None:
+                return None
+            entries[key] = entry
+            return entry[0]
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(get_key_family(key), key)
+
+    def clear(self):
+        with self._lock:
+            for family, entries in self._entries.items():
+                entries.clear()
+                self.sizes[family] = 0
+
+    def _delete(self, family, key):
+        entry = self._entries[family].pop(key, None)
+        if entry is not None:
+            self.sizes[family] -= entry[1]
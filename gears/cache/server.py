@@ -0,0 +1,137 @@
+"""The reference cache server, that speaks the subset of memcached text
+protocol used by :class:`~gears.cache.MemcachedCache`: ``get``, ``set``,
+``delete``, ``flush_all``, ``version`` and ``quit`` commands. Entries are
+kept in memory and never expire. It can be used to test the shared cache
+locally::
+
+    $ python -m gears.cache.server 127.0.0.1:11211
+"""
+
+import sys
+import threading
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+
+class CacheRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if not parts:
+                self.reply(b'ERROR')
+                continue
+            command = parts[0]
+            if command in (b'get', b'gets'):
+                self.get(parts[1:])
+            elif command == b'set' and len(parts) in (5, 6):
+                if not self.set(parts):
+                    return
+            elif command == b'delete' and len(parts) in (2, 3):
+                self.delete(parts)
+            elif command == b'flush_all':
+                self.server.clear()
+                self.reply(b'OK', parts)
+            elif command == b'version':
+                self.reply(b'VERSION gears')
+            elif command == b'quit':
+                return
+            else:
+                self.reply(b'ERROR')
+
+    def get(self, keys):
+        response = []
+        for key in keys:
+            data = self.server.get(key)
+            if data is not None:
+                response.append(b'VALUE ' + key + b' 0 ' +
+                                str(len(data)).encode('ascii') + b'\r\n' +
+                                data + b'\r\n')
+        response.append(b'END\r\n')
+        self.wfile.write(b''.join(response))
+
+    def set(self, parts):
+        try:
+            size = int(parts[4])
+        except ValueError:
+            self.reply(b'CLIENT_ERROR bad command line format')
+            return False
+        data = self.rfile.read(size + 2)
+        if len(data) != size + 2:
+            return False
+        if size > self.server.max_value_size:
+            self.reply(b'SERVER_ERROR object too large for cache', parts)
+        else:
+            self.server.set(parts[1], data[:-2])
+            self.reply(b'STORED', parts)
+        return True
+
+    def delete(self, parts):
+        if self.server.delete(parts[1]):
+            self.reply(b'DELETED', parts)
+        else:
+            self.reply(b'NOT_FOUND', parts)
+
+    def reply(self, response, parts=()):
+        if parts and parts[-1] == b'noreply':
+            return
+        self.wfile.write(response + b'\r\n')
+
+
+class CacheServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """The server, that keeps cache entries in memory.
+
+    :param address: the two-tuple with host and port to listen on. If port is
+                    0, any free port is used (see :attr:`server_address`).
+    """
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    #: The maximum size of the value in bytes.
+    max_value_size = 1024 * 1024
+
+    def __init__(self, address=('127.0.0.1', 11211)):
+        socketserver.TCPServer.__init__(self, address, CacheRequestHandler)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = data
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    host, port = '127.0.0.1', 11211
+    if argv:
+        host, sep, port = argv[0].rpartition(':')
+        host, port = host or '127.0.0.1', int(port)
+    server = CacheServer((host, port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
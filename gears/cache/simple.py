@@ -0,0 +1,7 @@
+class SimpleCache(dict):
+
+    def set(self, key, value):
+        self[key] = value
+
+    def get(self, key):
+        return super(SimpleCache, self).get(key)
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+class SQLiteCache(object):
+    """The cache that stores all entries in a single SQLite database file.
+    The database is used in WAL mode, so many processes can read from the
+    cache while one of them is writing to it.
+
+    :param path: the path to the database file. It is created if it doesn't
+                 exist.
+    :param timeout: the time in seconds to wait for the lock held by another
+                    writer.
+    """
+
+    #: The maximum number of keys in one query of :meth:`get_many`.
+    chunk_size = 500
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # Connections can't be shared between threads or forked processes.
+        if getattr(self._local, 'pid', None) != os.getpid():
+            self._local.connection = self._connect()
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, mapping):
+        """Save all key/value pairs from ``mapping`` in one transaction."""
+        rows = [(key, sqlite3.Binary(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+                for key, value in mapping.items()]
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)', rows)
+        except sqlite3.Error:
+            pass
+
+    def get_many(self, keys):
+        """Return a dict with values for found ``keys``. Keys that are not
+        found are missing from the result.
+        """
+        keys = list(keys)
+        result = {}
+        for i in range(0, len(keys), self.chunk_size):
+            chunk = keys[i:i + self.chunk_size]
+            query = 'SELECT key, value FROM cache WHERE key IN (%s)' % (
+                ', '.join('?' * len(chunk)))
+            try:
+                rows = self.connection.execute(query, chunk).fetchall()
+            except sqlite3.Error:
+                continue
+            for key, value in rows:
+                try:
+                    result[key] = pickle.loads(bytes(value))
+                except (pickle.PickleError, EOFError, ValueError):
+                    continue
+        return result
+
+    def delete(self, key):
+        try:
+            with self.connection:
+                self.connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error:
+            pass
+
+    def _connect(self):
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.exists(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                pass
+        connection = sqlite3.connect(self.path, timeout=self.timeout)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS cache '
+                               '(key TEXT PRIMARY KEY, value BLOB NOT NULL)')
+        return connection
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from .base import get_many, lock_cache_key, set_many
+from .keys import get_key_family
+from .memory import get_size
+
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+class CacheStats(object):
+    """Statistics of cache usage, collected by :class:`StatsCache` for each
+    key family (see :func:`~gears.cache.keys.get_key_family`): the number of
+    hits, misses and sets, approximate sizes of read and written values in
+    bytes, and the time in seconds spent in ``get`` and ``set``.
+    """
+
+    fields = ('hits', 'misses', 'sets', 'bytes_read', 'bytes_written',
+              'get_time', 'set_time')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all collected statistics."""
+        with self._lock:
+            self._families = {}
+
+    def add(self, family, **values):
+        """Add ``values`` (keyword arguments named after :attr:`fields`) to
+        the statistics of the key ``family``.
+        """
+        with self._lock:
+            stats = self._families.get(family)
+            if stats is None:
+                stats = self._families[family] = dict.fromkeys(self.fields, 0)
+            for field, value in values.items():
+                stats[field] += value
+
+    def merge(self, data):
+        """Add statistics from ``data``, returned by :meth:`as_dict` of other
+        stats object (e.g. in the worker process).
+        """
+        for family, values in data.items():
+            if family != 'total':
+                self.add(family, **values)
+
+    def as_dict(self):
+        """Return the dict with statistics for each key family, and their
+        ``'total'``.
+        """
+        with self._lock:
+            data = dict((family, dict(stats))
+                        for family, stats in self._families.items())
+        total = dict.fromkeys(self.fields, 0)
+        for stats in data.values():
+            for field in self.fields:
+                total[field] += stats[field]
+        data['total'] = total
+        return data
+
+
+class StatsCache(object):
+    """The wrapper that collects :class:`CacheStats` of the ``cache``.
+
+    :param cache: the wrapped cache.
+    :param stats: the :class:`CacheStats` object to collect statistics to. A
+                  new one is created if it is not set.
+    """
+
+    def __init__(self, cache, stats=None):
+        self.cache = cache
+        self.stats = stats if stats is not None else CacheStats()
+
+    def set(self, key, value):
+        started = timer()
+        self.cache.set(key, value)
+        self.stats.add(get_key_family(key), sets=1, set_time=timer() - started,
+                       bytes_written=get_size(value))
+
+    def get(self, key):
+        started = timer()
+        value = self.cache.get(key)
+        elapsed = timer() - started
+        if value is None:
+            self.stats.add(get_key_family(key), misses=1, get_time=elapsed)
+        else:
+            self.stats.add(get_key_family(key), hits=1, get_time=elapsed,
+                           bytes_read=get_size(value))
+        return value
+
+    def set_many(self, mapping):
+        started = timer()
+        set_many(self.cache, mapping)
+        elapsed = timer() - started
+        for key, value in mapping.items():
+            self.stats.add(get_key_family(key), sets=1,
+                           set_time=elapsed / len(mapping),
+                           bytes_written=get_size(value))
+
+    def get_many(self, keys):
+        keys = list(keys)
+        started = timer()
+        values = get_many(self.cache, keys)
+        elapsed = timer() - started
+        for key in keys:
+            # The time of the batch is split between its keys.
+            if key in values:
+                self.stats.add(get_key_family(key), hits=1,
+                               get_time=elapsed / len(keys),
+                               bytes_read=get_size(values[key]))
+            else:
+                self.stats.add(get_key_family(key), misses=1,
+                               get_time=elapsed / len(keys))
+        return values
+
+    def lock(self, key):
+        return lock_cache_key(self.cache, key)
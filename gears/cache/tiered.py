@@ -0,0 +1,86 @@
+from .base import get_many, lock_cache_key, set_many
+from .keys import get_key_family
+from .memory import MemoryCache
+
+
+class TieredCache(object):
+    """The cache that keeps recently used entries of the persistent ``backend``
+    (e.g. :class:`~gears.cache.FileBasedCache`) in memory. Entries are written
+    to both tiers, and are read from the backend only if they are not found in
+    memory.
+
+    Entries read from the backend are copied to memory. Large bundled and
+    compressed sources are copied only after they were read from the backend
+    :attr:`promote_after` times, and are written to memory only if they are
+    already there, so bundles that are used once (e.g. during
+    :meth:`~gears.environment.Environment.save`) don't push hot entries out of
+    memory.
+
+    :param backend: the persistent cache.
+    :param memory: the in-memory cache. Defaults to
+                   :class:`~gears.cache.MemoryCache` with default budgets.
+    """
+
+    #: The number of reads from the backend after which bundled and compressed
+    #: sources are copied to memory.
+    promote_after = 2
+
+    #: The maximum number of tracked entries that are not copied to memory yet.
+    max_tracked = 10000
+
+    def __init__(self, backend, memory=None):
+        self.backend = backend
+        self.memory = memory if memory is not None else MemoryCache()
+        self._reads = {}
+
+    def set(self, key, value):
+        self.backend.set(key, value)
+        if not self._is_bundle(key) or self.memory.get(key) is not None:
+            self.memory.set(key, value)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        value = self.backend.get(key)
+        if value is not None and self._is_hot(key):
+            self.memory.set(key, value)
+        return value
+
+    def set_many(self, mapping):
+        set_many(self.backend, mapping)
+        for key, value in mapping.items():
+            if not self._is_bundle(key) or self.memory.get(key) is not None:
+                self.memory.set(key, value)
+
+    def get_many(self, keys):
+        values = {}
+        missing_keys = []
+        for key in keys:
+            value = self.memory.get(key)
+            if value is not None:
+                values[key] = value
+            else:
+                missing_keys.append(key)
+        for key, value in get_many(self.backend, missing_keys).items():
+            if self._is_hot(key):
+                self.memory.set(key, value)
+            values[key] = value
+        return values
+
+    def lock(self, key):
+        return lock_cache_key(self.backend, key)
+
+    def _is_bundle(self, key):
+        return get_key_family(key) in ('bundled_source', 'compressed_source')
+
+    def _is_hot(self, key):
+        if not self._is_bundle(key):
+            return True
+        reads = self._reads.pop(key, 0) + 1
+        if reads >= self.promote_after:
+            return True
+        if len(self._reads) >= self.max_tracked:
+            self._reads.clear()
+        self._reads[key] = reads
+        return False
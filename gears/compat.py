@@ -1,4 +1,5 @@
 import collections
+import os
 import sys
 
 
@@ -6,6 +7,11 @@ is_py2 = (sys.version_info[0] == 2)
 is_py3 = (sys.version_info[0] == 3)
 
 
+# os.replace is atomic and overwrites existing files on all platforms, but it
+# is available only since Python 3.3.
+replace = getattr(os, 'replace', os.rename)
+
+
 class UnicodeMixin(object):
     """Python 3 compatible __str__/__unicode__ support"""
 
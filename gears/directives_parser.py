@@ -34,6 +34,23 @@ class DirectivesParser(object):
                 header_lines.append(line)
         return directives, '\n'.join(header_lines)
 
+    def read_header(self, f, chunk_size=4096):
+        """Read the file object ``f`` until the end of the header, so the
+        directives can be parsed without reading the whole file. The returned
+        source can include some code after the header.
+        """
+        source = ''
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return source
+            source += chunk
+            header, rest = self.split_source(source)
+            rest = rest.lstrip()
+            # The rest of the source can start with an unfinished comment.
+            if rest and not rest.startswith(('/', '#')):
+                return source
+
     def parse(self, source):
         header, source = self.split_source(source)
         directives, header = self.split_header(header)
@@ -1,20 +1,32 @@
-import gzip
+import hashlib
+import logging
 import os
+import time
 from pkg_resources import iter_entry_points
 from glob2.fnmatch import fnmatch
 
+from . import __version__
+from .archives import exists, is_archive
 from .asset_attributes import AssetAttributes
 from .assets import build_asset
-from .cache import SimpleCache
-from .compat import bytes
-from .exceptions import FileNotFound
+from .cache import CacheStats, SimpleCache, StatsCache
+from .exceptions import FileNotFound, ImproperlyConfigured
+from .graph import AssetGraph
 from .manifest import Manifest
+from .precompressors import GzipPrecompressor
 from .processors import (
     DirectivesProcessor,
     HexdigestPathsProcessor,
     SemicolonsProcessor
 )
+from .scheduler import BuildScheduler
+from .session import BuildSession
 from .utils import get_condition_func, unique
+from .watchers import get_watcher
+from .writers import FileWriter
+
+
+logger = logging.getLogger(__name__)
 
 
 DEFAULT_PUBLIC_ASSETS = (
@@ -32,10 +44,14 @@ class Finders(list):
     were added.
     """
 
+    #: The number of changes made by :meth:`register` and :meth:`unregister`.
+    version = 0
+
     def register(self, finder):
         """Append passed ``finder`` to the list of finders."""
         if finder not in self:
             self.append(finder)
+            self.version += 1
 
     def unregister(self, finder):
         """Remove passed ``finder`` from the list of finders. If ``finder``
@@ -43,6 +59,7 @@ class Finders(list):
         """
         if finder in self:
             self.remove(finder)
+            self.version += 1
 
     def list(self, path):
         for finder in self:
@@ -56,6 +73,9 @@ class MIMETypes(dict):
     MIME type.
     """
 
+    #: The number of changes made by :meth:`register` and :meth:`unregister`.
+    version = 0
+
     def register_defaults(self):
         """Register MIME types for ``.js`` and ``.css`` extensions."""
         self.register('.css', 'text/css')
@@ -65,6 +85,7 @@ class MIMETypes(dict):
         """Register passed ``mimetype`` MIME type with ``extension`` extension.
         """
         self[extension] = mimetype
+        self.version += 1
 
     def unregister(self, extension):
         """Remove registered MIME type for passed ``extension`` extension. If
@@ -73,6 +94,7 @@ class MIMETypes(dict):
         """
         if extension in self:
             del self[extension]
+            self.version += 1
 
 
 class Compilers(dict):
@@ -81,9 +103,13 @@ class Compilers(dict):
     compiler.
     """
 
+    #: The number of changes made by :meth:`register` and :meth:`unregister`.
+    version = 0
+
     def register(self, extension, compiler):
         """Register passed `compiler` with passed `extension`."""
         self[extension] = compiler
+        self.version += 1
 
     def unregister(self, extension):
         """Remove registered compiler for passed `extension`. If compiler for
@@ -91,15 +117,20 @@ class Compilers(dict):
         """
         if extension in self:
             del self[extension]
+            self.version += 1
 
 
 class Processors(dict):
     """Base class for processors registries."""
 
+    #: The number of changes made by :meth:`register` and :meth:`unregister`.
+    version = 0
+
     def register(self, mimetype, processor):
         """Register passed `processor` for passed `mimetype`."""
         if mimetype not in self or processor not in self[mimetype]:
             self.setdefault(mimetype, []).append(processor)
+            self.version += 1
 
     def unregister(self, mimetype, processor):
         """Remove passed `processor` for passed `mimetype`. If processor for
@@ -107,6 +138,7 @@ class Processors(dict):
         """
         if mimetype in self and processor in self[mimetype]:
             self[mimetype].remove(processor)
+            self.version += 1
 
     def get(self, mimetype):
         """Return a list of processors, registered for passed `mimetype`. If
@@ -149,9 +181,13 @@ class Compressors(dict):
     can have only one compressor.
     """
 
+    #: The number of changes made by :meth:`register` and :meth:`unregister`.
+    version = 0
+
     def register(self, mimetype, compressor):
         """Register passed `compressor` for passed `mimetype`."""
         self[mimetype] = compressor
+        self.version += 1
 
     def unregister(self, mimetype):
         """Remove registered compressors for passed `mimetype`. If compressor
@@ -159,6 +195,34 @@ class Compressors(dict):
         """
         if mimetype in self:
             del self[mimetype]
+            self.version += 1
+
+
+class Precompressors(Processors):
+    """The registry for asset precompressors. It acts like a dictionary with
+    MIME types as keys and lists of precompressors as values. Each
+    precompressor saves its own compressed copy of public assets (e.g. ``.gz``
+    or ``.br``). Precompressors registered for ``*`` are used for MIME types
+    that have no precompressors of their own.
+
+    Precompressors are used only if ``gzip`` param of
+    :class:`~gears.environment.Environment` is set to ``True``. By default,
+    :class:`~gears.precompressors.GzipPrecompressor` is registered for ``*``.
+    """
+
+    def register_defaults(self):
+        """Register :class:`~gears.precompressors.GzipPrecompressor` for all
+        MIME types.
+        """
+        self.register('*', GzipPrecompressor())
+
+    def get(self, mimetype):
+        """Return a list of precompressors, registered for passed `mimetype`,
+        or for ``*``, if no precompressors are registered for this MIME type.
+        """
+        if mimetype in self:
+            return self[mimetype]
+        return super(Precompressors, self).get('*')
 
 
 class Suffixes(list):
@@ -229,11 +293,42 @@ class Environment(object):
                   store compilation results.
     :param fingerprinting: if set to `True`, fingerprinted versions of assets
                            won't be created.
+    :param cache_stats: if set to `True`, statistics of cache usage are
+                        collected to :attr:`cache_stats`.
+    :param verify_sources: if set to `True`, sources and dependencies are
+                           hashed on every check to find out if they are
+                           changed. Otherwise they are hashed only if their
+                           modification times, sizes or inode numbers are
+                           changed.
+    :param hash_name: the name of the hash algorithm (any supported by
+                      :func:`hashlib.new` with fixed digest size, e.g.
+                      ``'blake2b'``), used for fingerprints and to find out if
+                      sources are changed.
+    :param fingerprint_length: the positive number of hex digits of the digest
+                               used as the fingerprint. Defaults to the full
+                               digest.
+    :param find_cache_ttl: the time in seconds :meth:`find` results are
+                           cached for outside of builds (e.g. when assets are
+                           served by the development server). By default they
+                           are cached only during builds. Found files are
+                           checked to exist before cached results are used.
+    :param graph_path: the path to the file the :attr:`graph` is stored in.
+                       It must be outside of :attr:`root` directory, as the
+                       graph contains absolute paths of sources. If it isn't
+                       set, the graph is stored in the cache, so it is lost
+                       with non-persistent caches, and :meth:`rebuild` saves
+                       everything then.
     """
 
+    #: The maximum number of results cached by :meth:`find` outside of
+    #: builds. Expired results are dropped when it is reached.
+    find_cache_size = 1000
+
     def __init__(self, root, public_assets=DEFAULT_PUBLIC_ASSETS,
                  manifest_path=None, cache=None, gzip=False,
-                 fingerprinting=True):
+                 fingerprinting=True, cache_stats=False, verify_sources=False,
+                 hash_name='sha1', fingerprint_length=None,
+                 find_cache_ttl=None, graph_path=None):
         self.root = root
         self.public_assets = [get_condition_func(c) for c in public_assets]
 
@@ -248,8 +343,58 @@ class Environment(object):
         else:
             self.cache = SimpleCache()
 
+        #: Statistics of cache usage (see :class:`~gears.cache.CacheStats`),
+        #: or ``None`` if ``cache_stats`` param is not set. They are reset by
+        #: :meth:`save` and :meth:`rebuild`, so they describe the last build.
+        self.cache_stats = None
+        if cache_stats:
+            self.cache_stats = CacheStats()
+            self.cache = StatsCache(self.cache, self.cache_stats)
+
         self.gzip = gzip
         self.fingerprinting = fingerprinting
+        self.verify_sources = verify_sources
+
+        try:
+            digest_size = hashlib.new(hash_name).digest_size
+        except ValueError:
+            raise ImproperlyConfigured('Hash %s is not available' % hash_name)
+        if not digest_size:
+            raise ImproperlyConfigured(
+                'Hash %s has variable digest size and cannot be used' % hash_name)
+        if fingerprint_length is not None and fingerprint_length < 1:
+            raise ImproperlyConfigured('fingerprint_length must be positive')
+        if fingerprint_length is None or fingerprint_length > digest_size * 2:
+            fingerprint_length = digest_size * 2
+        self.hash_name = hash_name
+        self.fingerprint_length = fingerprint_length
+
+        #: The session that memoizes stat results, contents and digests of
+        #: files during the build. See :class:`~gears.session.BuildSession`
+        #: for more information.
+        self.session = BuildSession(hash_name)
+
+        self.find_cache_ttl = find_cache_ttl
+        self._find_cache = {}
+        self._find_cache_state = None
+        self._find_cache_generation = 0
+
+        self.graph_path = graph_path
+
+        #: The graph of public assets and files they are built from. It is
+        #: filled by :meth:`save` and is stored in the cache, or in the file
+        #: given by ``graph_path`` param. See :class:`~gears.graph.AssetGraph`
+        #: for more information.
+        self.graph = self._load_graph()
+
+        #: The registry for asset precompressors. See
+        #: :class:`~gears.environment.Precompressors` for more information.
+        self.precompressors = Precompressors()
+        self.precompressors.register_defaults()
+
+        #: The object used to write public assets to :attr:`root` directory.
+        #: See :class:`~gears.writers.FileWriter` for more information.
+        self.writer = FileWriter(self)
 
         #: The registry for file finders. See
         #: :class:`~gears.environment.Finders` for more information.
@@ -278,10 +423,12 @@ class Environment(object):
     @property
     def suffixes(self):
         """The registry for supported suffixes of assets. It is built from
-        MIME types and compilers registries, and is cached at the first call.
-        See :class:`~gears.environment.Suffixes` for more information.
+        MIME types and compilers registries, and is cached until they are
+        changed. See :class:`~gears.environment.Suffixes` for more information.
         """
-        if not hasattr(self, '_suffixes'):
+        state = self._get_registries_state([self.mimetypes, self.compilers])
+        if getattr(self, '_suffixes_state', None) != state:
+            self._suffixes_state = state
             suffixes = Suffixes()
             for extension, mimetype in self.mimetypes.items():
                 suffixes.register(extension, root=True, mimetype=mimetype)
@@ -351,7 +498,74 @@ class Environment(object):
 
         If nothing is found, :class:`gears.exceptions.FileNotFound` exception
         is rased.
+
+        Both found and missing files are cached during the build (while
+        :attr:`session` is active), until finders, compilers, MIME types,
+        processors or compressors are changed. Outside of the build results
+        are cached only if ``find_cache_ttl`` param is set. Use
+        :meth:`clear_find_cache` if finders are changed without
+        :class:`Finders` methods.
         """
+        if isinstance(item, AssetAttributes):
+            key = (item.path, logical, True)
+        else:
+            key = (item, logical, False)
+        if self.session.active:
+            key += self._get_find_cache_state()
+            found = self.session.memoize(
+                'find', key, lambda k: self._find_path(item, logical))
+        elif self.find_cache_ttl is not None:
+            found = self._find_with_ttl(key, item, logical)
+        else:
+            found = self._find_path(item, logical)
+        if found is None:
+            raise FileNotFound(key[0])
+        path, absolute_path = found
+        return AssetAttributes(self, path), absolute_path
+
+    def clear_find_cache(self):
+        """Forget all results cached by :meth:`find`."""
+        self._find_cache_generation += 1
+        self._find_cache = {}
+
+    def _find_path(self, item, logical):
+        try:
+            asset_attributes, absolute_path = self._find(item, logical)
+        except FileNotFound:
+            return None
+        return asset_attributes.path, absolute_path
+
+    def _find_with_ttl(self, key, item, logical):
+        state = self._get_find_cache_state()
+        if state != self._find_cache_state:
+            self._find_cache = {}
+            self._find_cache_state = state
+        now = time.time()
+        found, created = self._find_cache.get(key, (None, None))
+        if (created is not None and now - created < self.find_cache_ttl and
+                (found is None or exists(found[1]))):
+            return found
+        found = self._find_path(item, logical)
+        if len(self._find_cache) >= self.find_cache_size:
+            self._find_cache = dict(
+                (k, v) for k, v in self._find_cache.items()
+                if now - v[1] < self.find_cache_ttl)
+            if len(self._find_cache) >= self.find_cache_size:
+                self._find_cache = {}
+        self._find_cache[key] = (found, now)
+        return found
+
+    def _get_find_cache_state(self):
+        return self._get_registries_state([
+            self.finders, self.compilers, self.mimetypes, self.preprocessors,
+            self.postprocessors, self.compressors,
+        ]) + (self._find_cache_generation,)
+
+    def _get_registries_state(self, registries):
+        return tuple((id(registry), getattr(registry, 'version', None))
+                     for registry in registries)
+
+    def _find(self, item, logical):
         if isinstance(item, AssetAttributes):
             for path in item.search_paths:
                 try:
@@ -421,32 +635,198 @@ class Environment(object):
             for result in self.finders.list(path):
                 yield result
 
-    def save(self):
-        """Save handled public assets to :attr:`root` directory."""
-        for asset_attributes, absolute_path in self.list('**'):
-            logical_path = os.path.normpath(asset_attributes.logical_path)
+    def save(self, jobs=None):
+        """Save handled public assets to :attr:`root` directory.
+
+        :param jobs: the number of processes used to build assets. If it is
+                     greater than one, assets are built in parallel by
+                     :class:`~gears.scheduler.BuildScheduler`. Worker processes
+                     share compilation results only through the cache, so
+                     a persistent cache (e.g.
+                     :class:`~gears.cache.FileBasedCache`) is recommended.
+        """
+        with self.session:
+            self._reset_cache_stats()
+            self.clear_find_cache()
+            items = [(os.path.normpath(asset_attributes.logical_path), absolute_path)
+                     for asset_attributes, absolute_path in self.list('**')]
+            if jobs is not None and jobs > 1:
+                results = BuildScheduler(self, jobs).run(items)
+            else:
+                results = [(path, self._save_asset(path)) for path, _ in items]
+                self.writer.wait()
+            self.graph = AssetGraph()
+            for logical_path, result in results:
+                self._update(logical_path, result)
+            self._dump_manifest()
+
+    def save_asset(self, logical_path):
+        """Save the asset with passed ``logical_path`` to :attr:`root`
+        directory, if it is public. Returns fingerprinted path of the saved
+        asset, or ``None`` if the asset is not public.
+
+        If the asset is not public according to :attr:`public_assets`, only
+        the header of its source is checked for the ``public`` directive, so
+        non-public assets are never built or read completely.
+        """
+        with self.session:
+            result = self._save_asset(logical_path)
+            self.writer.wait()
+        return result[0] if result else None
+
+    def _save_asset(self, logical_path):
+        if not self.is_public(logical_path):
             check_asset = build_asset(self, logical_path, check=True)
-            if check_asset.is_public:
-                asset = build_asset(self, logical_path)
-                source = bytes(asset)
-                self.save_file(logical_path, source, asset.gzippable)
-                if self.fingerprinting:
-                    self.save_file(asset.hexdigest_path, source, asset.gzippable)
-                    self.manifest.files[logical_path] = asset.hexdigest_path
+            if not check_asset.is_public:
+                return None
+        asset = build_asset(self, logical_path)
+        paths = [logical_path]
+        if self.fingerprinting:
+            paths.append(asset.hexdigest_path)
+        args = (paths, asset.encoded_source, asset.gzippable,
+                asset.attributes.mimetype)
+        # If the manifest already points to the asset with the same
+        # fingerprint, its files are up to date, if they are still in place.
+        if (self.manifest.files.get(logical_path) != asset.hexdigest_path or
+                not self.writer.is_written(*args)):
+            self.writer.write(*args)
+        return asset.hexdigest_path, asset.absolute_path, asset.source_paths
+
+    def _update(self, logical_path, result):
+        if result is None:
+            self.graph.remove(logical_path)
+            self.manifest.files.pop(logical_path, None)
+            return
+        hexdigest_path, absolute_path, source_paths = result
+        self.graph.add(logical_path, absolute_path, source_paths)
+        if self.fingerprinting:
+            self.manifest.files[logical_path] = hexdigest_path
+
+    def watch(self, watcher=None, jobs=None):
+        """Save handled public assets to :attr:`root` directory, and then
+        watch the search paths of registered finders for changes, rebuilding
+        only public assets that are built from changed files. This method
+        blocks until it is interrupted.
+
+        :param watcher: an instance of :class:`~gears.watchers.BaseWatcher`
+                        subclass. If it is not set, the watcher is chosen by
+                        :func:`~gears.watchers.get_watcher`.
+        :param jobs: the number of processes used to build assets for the
+                     first time. See :meth:`save`.
+        """
+        self.save(jobs)
+        if watcher is None:
+            watcher = get_watcher(self._get_watched_paths())
+        try:
+            while True:
+                changed_paths = watcher.wait()
+                if changed_paths is None:
+                    self._refresh_finders()
+                    self.save(jobs)
+                elif changed_paths:
+                    # Build errors are fixed by further changes, so watching
+                    # goes on.
+                    try:
+                        self.rebuild(changed_paths)
+                    except Exception:
+                        logger.exception('Failed to rebuild assets')
+        finally:
+            watcher.close()
+
+    def rebuild(self, changed_paths):
+        """Rebuild only public assets that are built from files in
+        ``changed_paths`` list, and update the manifest. New public assets
+        from this list are saved too, and removed ones are removed from the
+        manifest. Returns the set of logical paths of rebuilt assets.
+
+        Public assets are found using :attr:`graph`, stored by the previous
+        :meth:`save` call. If there is no graph yet,
+        everything is saved. Everything is also saved if any of registered
+        archives (see :class:`~gears.finders.ArchiveFinder`) is changed.
+        Finders that have ``refresh`` method (e.g.
+        :class:`~gears.finders.IndexedFileSystemFinder`) are refreshed for
+        ``changed_paths`` first.
+
+        Build errors are raised, after the manifest is updated for assets
+        rebuilt before the failed one. :meth:`watch` logs them and goes on.
+        """
+        with self.session:
+            changed_paths = [os.path.abspath(path) for path in changed_paths]
+            self._refresh_finders(changed_paths)
+            if not self.graph or any(is_archive(p) for p in changed_paths):
+                self.save()
+                return set(self.graph.absolute_paths)
+            self._reset_cache_stats()
+            logical_paths = self.graph.find(changed_paths)
+            for path in changed_paths:
+                logical_path = self._get_logical_path(path)
+                if logical_path is not None and os.path.isfile(path):
+                    logical_paths.add(logical_path)
+            try:
+                for logical_path in sorted(logical_paths):
+                    try:
+                        result = self._save_asset(logical_path)
+                    except Exception:
+                        absolute_path = self.graph.absolute_paths.get(logical_path)
+                        if absolute_path is None or exists(absolute_path):
+                            raise
+                        result = None
+                    self._update(logical_path, result)
+            finally:
+                # Assets rebuilt before the failure are kept in the manifest.
+                self.writer.wait()
+                self._dump_manifest()
+            return set(p for p in logical_paths if p in self.graph)
+
+    def _get_watched_paths(self):
+        paths = []
+        for finder in self.finders:
+            paths.extend(getattr(finder, 'watched_paths', getattr(finder, 'paths', ())))
+        return paths
+
+    def _refresh_finders(self, paths=None):
+        self.clear_find_cache()
+        for finder in self.finders:
+            if hasattr(finder, 'refresh'):
+                finder.refresh(paths)
+
+    def _reset_cache_stats(self):
+        if self.cache_stats is not None:
+            self.cache_stats.reset()
+
+    def _dump_manifest(self):
+        # The graph was stored in the manifest by older versions.
+        self.manifest.data.pop('sources', None)
         self.manifest.dump()
+        if self.graph_path is not None:
+            self.graph.dump(self.graph_path)
+        else:
+            self.cache.set(self._get_graph_cache_key(), self.graph.to_dict())
+
+    def _load_graph(self):
+        if self.graph_path is not None:
+            return AssetGraph.load(self.graph_path)
+        return AssetGraph.from_dict(self.cache.get(self._get_graph_cache_key()) or {})
 
-    def save_file(self, path, source, gzippable=False):
-        filename = os.path.join(self.root, path)
-        path = os.path.dirname(filename)
-        if not os.path.exists(path):
-            os.makedirs(path)
-        elif not os.path.isdir(path):
-            raise OSError("%s exists and is not a directory." % path)
-        with open(filename, 'wb') as f:
-            f.write(source)
-        if self.gzip and gzippable:
-            with gzip.open('{}.gz'.format(filename), 'wb') as f:
-                f.write(source)
+    def _get_graph_cache_key(self):
+        return 'graph:%s:%s' % (__version__, os.path.abspath(self.root))
+
+    def _get_logical_path(self, absolute_path):
+        for root in self.paths:
+            if absolute_path.startswith(os.path.join(root, '')):
+                path = os.path.relpath(absolute_path, root)
+                return os.path.normpath(AssetAttributes(self, path).logical_path)
+        return None
+
+    def save_file(self, path, source, gzippable=False, mimetype=None):
+        self.writer.write([path], source, gzippable, mimetype)
+        self.writer.wait()
 
     def is_public(self, logical_path):
         return any(condition(logical_path) for condition in self.public_assets)
+
+    def get_hexdigest(self, data):
+        """Return the hexdigest of ``data`` bytes, calculated using the hash
+        algorithm set by ``hash_name`` param.
+        """
+        return hashlib.new(self.hash_name, data).hexdigest()
@@ -1,7 +1,10 @@
 import os
+import threading
 import glob2
+from glob2.fnmatch import fnmatch
+from .archives import close_archive, open_archive, register_archive
 from .exceptions import ImproperlyConfigured, FileNotFound
-from .utils import safe_join
+from .utils import safe_join, scandir
 
 
 class BaseFinder(object):
@@ -48,3 +51,203 @@ class FileSystemFinder(BaseFinder):
                 if os.path.isfile(absolute_path):
                     logical_path = os.path.relpath(absolute_path, root)
                     yield logical_path, absolute_path
+
+
+class IndexedFileSystemFinder(FileSystemFinder):
+    """The finder that scans its directories once and answers :meth:`find`
+    and :meth:`list` calls (including ``**`` patterns) from the in-memory
+    index, so failed lookups of suffixes and search paths don't touch the
+    file system.
+
+    The index isn't updated automatically, so :meth:`refresh` must be called
+    when files are added or removed. :meth:`~gears.environment.Environment.rebuild`
+    (and so :meth:`~gears.environment.Environment.watch`) does it for changed
+    paths.
+    """
+
+    def __init__(self, directories):
+        super(IndexedFileSystemFinder, self).__init__(directories)
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def index(self):
+        """A dict with a tree of each directory, keyed by its path. Each tree
+        is a dict with names of entries as keys, and trees of subdirectories
+        or ``None`` for files as values.
+        """
+        with self._lock:
+            if self._index is None:
+                self._index = dict((root, self._scan(root)) for root in self.locations)
+            return self._index
+
+    def refresh(self, paths=None):
+        """Update the index. If ``paths`` list is passed, only these absolute
+        paths are rescanned, otherwise everything is scanned again on the next
+        lookup.
+        """
+        if paths is None:
+            with self._lock:
+                self._index = None
+            return
+        index = self.index
+        with self._lock:
+            for path in paths:
+                for root in self.locations:
+                    parts = self._split(root, path)
+                    if parts:
+                        self._update(index[root], root, parts)
+
+    def find_location(self, root, path):
+        path = safe_join(root, path)
+        if self._lookup(self.index[root], self._split(root, path)) is not False:
+            return path
+
+    def list(self, path):
+        index = self.index
+        for root in self.locations:
+            parts = self._split(root, safe_join(root, path))
+            for logical_path in self._match(index[root], parts, ''):
+                yield logical_path, os.path.join(root, logical_path)
+
+    def _split(self, root, path):
+        root = os.path.normpath(root)
+        if path == root:
+            return []
+        if not path.startswith(root.rstrip(os.sep) + os.sep):
+            return None
+        return path[len(root.rstrip(os.sep)) + 1:].split(os.sep)
+
+    def _scan(self, path, seen=None):
+        if seen is None:
+            seen = set()
+        realpath = os.path.realpath(path)
+        if realpath in seen:
+            return {}
+        seen = seen | set([realpath])
+        try:
+            entries = scandir(path)
+        except OSError:
+            return {}
+        tree = {}
+        for name, is_directory in entries:
+            if is_directory:
+                tree[name] = self._scan(os.path.join(path, name), seen)
+            else:
+                tree[name] = None
+        return tree
+
+    def _update(self, tree, root, parts):
+        path = root
+        for part in parts[:-1]:
+            path = os.path.join(path, part)
+            if not isinstance(tree.get(part), dict):
+                # The directory is new, so all its entries are scanned.
+                if os.path.isdir(path):
+                    tree[part] = self._scan(path)
+                return
+            tree = tree[part]
+        name = parts[-1]
+        path = os.path.join(path, name)
+        if os.path.isdir(path):
+            tree[name] = self._scan(path)
+        elif os.path.exists(path):
+            tree[name] = None
+        else:
+            tree.pop(name, None)
+
+    def _lookup(self, tree, parts):
+        if parts is None:
+            return False
+        for part in parts:
+            if not isinstance(tree, dict) or part not in tree:
+                return False
+            tree = tree[part]
+        return tree
+
+    def _match(self, tree, parts, prefix):
+        if not parts:
+            if tree is None:
+                yield prefix
+            return
+        if tree is None:
+            return
+        part, rest = parts[0], parts[1:]
+        if part == '**':
+            # Matches any number of directories, or any file at the end.
+            if rest:
+                for path in self._match(tree, rest, prefix):
+                    yield path
+            for name, child in sorted(tree.items()):
+                if name.startswith('.'):
+                    continue
+                path = self._join(prefix, name)
+                if child is not None:
+                    for path in self._match(child, parts, path):
+                        yield path
+                elif not rest:
+                    yield path
+        elif glob2.has_magic(part):
+            for name, child in sorted(tree.items()):
+                if name.startswith('.') and not part.startswith('.'):
+                    continue
+                if fnmatch(name, part):
+                    for path in self._match(child, rest, self._join(prefix, name)):
+                        yield path
+        elif part in tree:
+            for path in self._match(tree[part], rest, self._join(prefix, part)):
+                yield path
+
+    def _join(self, prefix, name):
+        return os.path.join(prefix, name) if prefix else name
+
+
+class ArchiveFinder(IndexedFileSystemFinder):
+    """The finder that finds and lists files in zip archives (e.g. wheels or
+    packed front-end libraries), so they don't have to be unpacked. The
+    central directory of each archive is read once, and contents of files are
+    read through the memory map of the archive (see
+    :class:`~gears.archives.ZipArchive`).
+
+    Found files have absolute paths inside of the archive path (e.g.
+    ``/libs/vendor.zip/js/jquery.js``). They are read, stat'ed and listed by
+    the build session like usual files.
+
+    :param archives: the list of absolute paths of zip archives.
+    """
+
+    def __init__(self, archives):
+        if not isinstance(archives, (list, tuple)):
+            raise ImproperlyConfigured(
+                "ArchiveFinder's 'archives' parameter is not a "
+                "tuple or list; perhaps you forgot a trailing comma?")
+        super(ArchiveFinder, self).__init__(
+            [os.path.normpath(path) for path in archives])
+        for path in self.locations:
+            register_archive(path)
+
+    @property
+    def paths(self):
+        # Archives can't be used as search paths by compilers.
+        return []
+
+    @property
+    def watched_paths(self):
+        """The list of paths watched by
+        :meth:`~gears.environment.Environment.watch`: paths of archives.
+        """
+        return self.locations
+
+    def refresh(self, paths=None):
+        """Read archives again, if ``paths`` is ``None`` or contains any of
+        them (e.g. if archives are replaced during
+        :meth:`~gears.environment.Environment.watch`).
+        """
+        if paths is not None and not set(paths) & set(self.locations):
+            return
+        for path in self.locations:
+            close_archive(path)
+        super(ArchiveFinder, self).refresh()
+
+    def _scan(self, path, seen=None):
+        return open_archive(path).tree
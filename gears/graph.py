@@ -0,0 +1,94 @@
+import errno
+import json
+import os
+
+
+class AssetGraph(object):
+    """The graph of public assets and source files they are built from. It is
+    filled by :meth:`~gears.environment.Environment.save`, is stored in the
+    cache or in its own file (not in the manifest, as it contains absolute
+    paths of sources), and is used to find public assets that must be rebuilt
+    when some source files are changed.
+    """
+
+    def __init__(self):
+        #: Absolute paths of public assets, keyed by logical paths.
+        self.absolute_paths = {}
+        self._sources = {}
+        self._assets = {}
+
+    @classmethod
+    def from_dict(cls, data):
+        self = cls()
+        for logical_path, item in data.items():
+            self.add(logical_path, item['path'], item['sources'])
+        return self
+
+    @classmethod
+    def load(cls, path):
+        """Load the graph from the JSON file with passed ``path``. If the file
+        doesn't exist, the graph is empty.
+        """
+        try:
+            with open(path) as f:
+                return cls.from_dict(json.load(f))
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        return cls()
+
+    def dump(self, path):
+        """Save the graph to the JSON file with passed ``path``."""
+        dirpath = os.path.dirname(path)
+        if dirpath and not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+    def __contains__(self, logical_path):
+        return logical_path in self.absolute_paths
+
+    def __len__(self):
+        return len(self.absolute_paths)
+
+    def add(self, logical_path, absolute_path, source_paths):
+        """Add public asset with passed ``logical_path`` and ``absolute_path``,
+        which is built from files and directories in ``source_paths`` list. If
+        the asset is already in the graph, its sources are replaced.
+        """
+        self.remove(logical_path)
+        self.absolute_paths[logical_path] = absolute_path
+        self._sources[logical_path] = set(source_paths)
+        for source_path in self._sources[logical_path]:
+            self._assets.setdefault(source_path, set()).add(logical_path)
+
+    def remove(self, logical_path):
+        """Remove public asset with passed ``logical_path`` from the graph. If
+        the asset is not in the graph, nothing happens.
+        """
+        self.absolute_paths.pop(logical_path, None)
+        for source_path in self._sources.pop(logical_path, ()):
+            assets = self._assets[source_path]
+            assets.discard(logical_path)
+            if not assets:
+                del self._assets[source_path]
+
+    def find(self, changed_paths):
+        """Return the set of logical paths of public assets, that are built
+        from any of ``changed_paths``. If a file is added to or removed from
+        a directory, assets that depend on this directory are also returned.
+        """
+        logical_paths = set()
+        for path in changed_paths:
+            for source_path in (path, os.path.dirname(path)):
+                logical_paths.update(self._assets.get(source_path, ()))
+        return logical_paths
+
+    def is_source(self, path):
+        """Return ``True`` if any public asset is built from ``path``."""
+        return path in self._assets
+
+    def to_dict(self):
+        return dict((logical_path, {'path': absolute_path,
+                                    'sources': sorted(self._sources[logical_path])})
+                    for logical_path, absolute_path in self.absolute_paths.items())
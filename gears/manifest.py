@@ -1,3 +1,4 @@
+import copy
 import os
 import errno
 import json
@@ -8,6 +9,7 @@ class Manifest(object):
     def __init__(self, path):
         self.path = path
         self.data = {}
+        self.dumped_data = None
         if self.path:
             self.load()
 
@@ -19,6 +21,7 @@ class Manifest(object):
         try:
             with open(self.path) as f:
                 self.data = json.load(f)
+            self.dumped_data = copy.deepcopy(self.data)
         except IOError as e:
             if e.errno != errno.ENOENT:
                 raise
@@ -26,8 +29,11 @@ class Manifest(object):
     def dump(self):
         if not self.path:
             return
+        if self.data == self.dumped_data and os.path.exists(self.path):
+            return
         dirpath = os.path.dirname(self.path)
         if not os.path.exists(dirpath):
             os.makedirs(dirpath)
         with open(self.path, 'w') as f:
-            json.dump(self.data, f, indent=2)
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        self.dumped_data = copy.deepcopy(self.data)
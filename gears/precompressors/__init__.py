@@ -0,0 +1,3 @@
+from .base import BasePrecompressor, GzipPrecompressor, ZlibPrecompressor
+from .brotli import BrotliPrecompressor
+from .zstd import ZstdPrecompressor
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import zlib
+
+
+class BasePrecompressor(object):
+    """Base class for all asset precompressors. Precompressors are used to
+    save compressed copies of public assets next to them, so web servers can
+    serve them without compressing on the fly. Subclasses have to implement
+    :meth:`compress` and :meth:`decompress` methods.
+
+    :param level: the compression level. If it is not set,
+                  :attr:`default_level` is used.
+    :param min_size: the minimum size of the source in bytes. Smaller sources
+                     are not compressed.
+    :param only_if_smaller: if set to ``True``, compressed copy is saved only if
+                            it is smaller than the source.
+    """
+
+    #: The extension that is appended to the asset path to get the path of its
+    #: compressed copy.
+    extension = None
+
+    #: The compression level used if ``level`` param is not set.
+    default_level = None
+
+    def __init__(self, level=None, min_size=0, only_if_smaller=False):
+        self.level = level if level is not None else self.default_level
+        self.min_size = min_size
+        self.only_if_smaller = only_if_smaller
+
+    def __call__(self, source):
+        """Returns compressed ``source``, or ``None`` if the compressed copy
+        shouldn't be saved.
+        """
+        if not self.accepts(source):
+            return None
+        compressed_source = self.compress(source)
+        if self.only_if_smaller and len(compressed_source) >= len(source):
+            return None
+        return compressed_source
+
+    def accepts(self, source):
+        """Returns ``True`` if ``source`` is large enough to be compressed."""
+        return len(source) >= self.min_size
+
+    def compress(self, source):
+        raise NotImplementedError
+
+    def decompress(self, compressed_source):
+        raise NotImplementedError
+
+
+class GzipPrecompressor(BasePrecompressor):
+
+    extension = '.gz'
+    default_level = 9
+
+    def compress(self, source):
+        # mtime is set to 0, so the same source is always compressed to the
+        # same bytes.
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=self.level,
+                           mtime=0) as f:
+            f.write(source)
+        return buffer.getvalue()
+
+    def decompress(self, compressed_source):
+        with gzip.GzipFile(fileobj=io.BytesIO(compressed_source)) as f:
+            return f.read()
+
+
+class ZlibPrecompressor(BasePrecompressor):
+
+    extension = '.deflate'
+    default_level = 9
+
+    def compress(self, source):
+        return zlib.compress(source, self.level)
+
+    def decompress(self, compressed_source):
+        return zlib.decompress(compressed_source)
@@ -0,0 +1,27 @@
+from __future__ import absolute_import
+
+try:
+    import brotli
+    brotli_available = True
+except ImportError:
+    brotli_available = False
+
+from .base import BasePrecompressor
+from ..exceptions import ImproperlyConfigured
+
+
+class BrotliPrecompressor(BasePrecompressor):
+
+    extension = '.br'
+    default_level = 11
+
+    def __init__(self, *args, **kwargs):
+        if not brotli_available:
+            raise ImproperlyConfigured('brotli is not available')
+        super(BrotliPrecompressor, self).__init__(*args, **kwargs)
+
+    def compress(self, source):
+        return brotli.compress(source, quality=self.level)
+
+    def decompress(self, compressed_source):
+        return brotli.decompress(compressed_source)
@@ -0,0 +1,27 @@
+from __future__ import absolute_import
+
+try:
+    import zstandard
+    zstandard_available = True
+except ImportError:
+    zstandard_available = False
+
+from .base import BasePrecompressor
+from ..exceptions import ImproperlyConfigured
+
+
+class ZstdPrecompressor(BasePrecompressor):
+
+    extension = '.zst'
+    default_level = 19
+
+    def __init__(self, *args, **kwargs):
+        if not zstandard_available:
+            raise ImproperlyConfigured('zstandard is not available')
+        super(ZstdPrecompressor, self).__init__(*args, **kwargs)
+
+    def compress(self, source):
+        return zstandard.ZstdCompressor(level=self.level).compress(source)
+
+    def decompress(self, compressed_source):
+        return zstandard.ZstdDecompressor().decompress(compressed_source)
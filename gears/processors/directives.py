@@ -53,27 +53,28 @@ class DirectivesProcessor(BaseProcessor):
                 self.asset.params[key] = value
 
     def process_require_directive(self, path):
+        path = self.get_relative_path(path)
         if self.check:
+            self.asset.required_paths.append(path)
             return
 
         found = False
-        path = self.get_relative_path(path)
-        list = self.asset.attributes.environment.list(path, self.asset.attributes.mimetype)
+        mimetype = self.asset.attributes.mimetype
+        pattern = os.path.basename(path)
+        list = self.asset.attributes.environment.list(path, mimetype)
         for asset_attributes, absolute_path in sorted(list, key=lambda x: x[0].path.split('/')):
             self.asset.requirements.add(self.get_asset(asset_attributes, absolute_path))
-            self.asset.dependencies.add(os.path.dirname(absolute_path))
+            self.asset.dependencies.add_directory(
+                os.path.dirname(absolute_path), pattern, mimetype,
+                recursive=path.endswith('**'))
             found = True
         if not found:
             raise FileNotFound(path)
 
     def process_require_directory_directive(self, path):
-        if self.check:
-            return
         self.process_require_directive(os.path.join(path, '*'))
 
     def process_require_tree_directive(self, path):
-        if self.check:
-            return
         self.process_require_directive(os.path.join(path, '**'))
 
     def process_require_self_directive(self):
@@ -0,0 +1,160 @@
+import multiprocessing
+
+from .asset_attributes import AssetAttributes
+from .assets import Asset, CheckAsset, get_cache_key
+
+
+#: The environment used by worker processes. Workers are forked from the
+#: process that runs :meth:`~gears.environment.Environment.save`, so the
+#: environment is inherited and doesn't have to be pickled.
+_environment = None
+
+
+def _init_worker(environment):
+    global _environment
+    _environment = environment
+
+
+def _save_group(logical_paths):
+    # Cache stats of workers are collected per group and merged by the parent.
+    if _environment.cache_stats is not None:
+        _environment.cache_stats.reset()
+    results = [(path, _environment._save_asset(path)) for path in logical_paths]
+    _environment.writer.wait()
+    if _environment.cache_stats is not None:
+        return results, _environment.cache_stats.as_dict()
+    return results, None
+
+
+class BuildScheduler(object):
+    """Builds public assets in a pool of worker processes. It is used by
+    :meth:`~gears.environment.Environment.save` if more than one job is
+    requested.
+
+    Requirements shared by several assets are built first, before worker
+    processes are forked, so workers take them from the cache (even if the
+    cache is not shared between processes) instead of processing them again.
+    Then assets are split into groups, so assets are built by the same worker
+    only if one of them requires another one or they share requirements that
+    are not built first, and groups are built in parallel.
+
+    Requirements are taken from the cache of previous builds, or, for assets
+    that were never built before, from ``require`` directives found by
+    :class:`~gears.assets.CheckAsset`, which reads only headers of sources and
+    caches its results too.
+
+    :param environment: an instance of :class:`~gears.environment.Environment`
+                        class.
+    :param jobs: the number of worker processes.
+    """
+
+    def __init__(self, environment, jobs):
+        self.environment = environment
+        self.jobs = jobs
+
+    def run(self, items):
+        """Build and save assets from ``items``, a list of two-tuples with
+        logical and absolute paths. Returns a list of two-tuples with logical
+        path and the result of saving the asset in the same order as
+        ``items``, so the manifest doesn't depend on the order in which workers
+        finish their tasks.
+        """
+        context = self._get_context()
+        if context is None:
+            results = [(path, self.environment._save_asset(path)) for path, _ in items]
+            self.environment.writer.wait()
+            return results
+        shared, groups = self.plan(items)
+        for attributes, absolute_path in shared:
+            Asset(attributes, absolute_path)
+        results = {}
+        pool = context.Pool(self.jobs, _init_worker, (self.environment,))
+        try:
+            for group_results, stats in pool.imap_unordered(_save_group, groups):
+                results.update(group_results)
+                if stats is not None:
+                    self.environment.cache_stats.merge(stats)
+        finally:
+            pool.terminate()
+            pool.join()
+        return [(path, results[path]) for path, _ in items]
+
+    def plan(self, items):
+        """Return a two-tuple with the list of requirements shared by several
+        assets from ``items`` and the list of groups of logical paths of these
+        assets. Requirements are two-tuples with
+        :class:`~gears.asset_attributes.AssetAttributes` and absolute paths.
+        Larger groups go first, so they don't end up being the last task in
+        the pool.
+        """
+        requirements = []
+        requirers = {}
+        for logical_path, absolute_path in items:
+            attributes = self.environment.find(logical_path, True)[0]
+            paths = list(self._iter_requirements(attributes, absolute_path, set()))
+            requirements.append(paths)
+            for path, required_attributes in paths:
+                requirers.setdefault(path, (required_attributes, set()))[1].add(absolute_path)
+
+        shared = sorted(((attributes, path)
+                         for path, (attributes, absolute_paths) in requirers.items()
+                         if len(absolute_paths) > 1), key=lambda item: item[1])
+
+        parents = {}
+
+        def find(key):
+            while parents.setdefault(key, key) != key:
+                parents[key] = parents[parents[key]]
+                key = parents[key]
+            return key
+
+        for (logical_path, absolute_path), paths in zip(items, requirements):
+            root = find(absolute_path)
+            for path, _ in paths:
+                if len(requirers[path][1]) == 1:
+                    parents[find(path)] = root
+
+        groups = {}
+        order = []
+        for logical_path, absolute_path in items:
+            root = find(absolute_path)
+            if root not in groups:
+                groups[root] = []
+                order.append(root)
+            if logical_path not in groups[root]:
+                groups[root].append(logical_path)
+        return shared, sorted((groups[root] for root in order), key=len, reverse=True)
+
+    def _iter_requirements(self, attributes, absolute_path, seen):
+        for path, required_attributes in self._get_requirements(attributes, absolute_path):
+            if path not in seen:
+                seen.add(path)
+                yield path, required_attributes
+                for requirement in self._iter_requirements(required_attributes, path, seen):
+                    yield requirement
+
+    def _get_requirements(self, attributes, absolute_path):
+        if not attributes.processors:
+            return []
+        data = self.environment.cache.get(
+            get_cache_key(absolute_path, namespace=attributes.cache_namespace))
+        if data:
+            requirements = data['requirements']
+            return [(path, AssetAttributes(self.environment, logical_path))
+                    for path, logical_path in requirements['before'] + requirements['after']]
+        check_asset = CheckAsset(attributes, absolute_path)
+        return [(path, required_attributes)
+                for required_path in check_asset.required_paths
+                for required_attributes, path in self.environment.list(
+                    required_path, attributes.mimetype)]
+
+    def _get_context(self):
+        # Workers must be forked to inherit the environment, as it can contain
+        # objects that can't be pickled (e.g. public assets conditions).
+        get_context = getattr(multiprocessing, 'get_context', None)
+        if get_context is None:
+            return multiprocessing
+        try:
+            return get_context('fork')
+        except ValueError:
+            return None
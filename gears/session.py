@@ -0,0 +1,113 @@
+import hashlib
+import threading
+
+from . import archives
+from .utils import get_stat_signature
+
+
+class BuildSession(object):
+    """Memoizes results of :func:`os.stat`, contents of files and their
+    digests while the session is active, so files shared by many assets (e.g.
+    common requirements, directory dependencies and images referenced from
+    stylesheets) are stat'ed, read and hashed only once per build.
+
+    The session is activated using ``with`` statement. Sessions can be
+    nested, and memoized results are forgotten when the outermost one ends.
+    If the session is not active, nothing is memoized, so changes of files are
+    always noticed. :meth:`~gears.environment.Environment.save` and
+    :meth:`~gears.environment.Environment.rebuild` run in the session of the
+    environment.
+
+    :param hash_name: the name of the hash algorithm used by :meth:`hexdigest`.
+    """
+
+    #: Contents of files larger than this (in bytes) are not memoized, only
+    #: their digests are.
+    max_file_size = 1024 * 1024
+
+    #: The size of chunks in which large files are read to hash them.
+    chunk_size = 64 * 1024
+
+    def __init__(self, hash_name='sha1'):
+        self.hash_name = hash_name
+        self._depth = 0
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        with self._lock:
+            self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        with self._lock:
+            self._depth -= 1
+            if not self._depth:
+                self._results.clear()
+
+    @property
+    def active(self):
+        return self._depth > 0
+
+    def clear(self):
+        """Forget all memoized results, e.g. if files are changed during the
+        session.
+        """
+        self._results.clear()
+
+    def stat(self, path):
+        return self.memoize('stat', path, archives.stat)
+
+    def signature(self, path):
+        """Return the stat signature of ``path`` (see
+        :func:`~gears.utils.get_stat_signature`).
+        """
+        return get_stat_signature(self.stat(path))
+
+    def listdir(self, path):
+        return self.memoize('listdir', path, lambda p: [
+            name for name, is_directory in archives.scandir(p)])
+
+    def scandir(self, path):
+        """Return the sorted list of two-tuples with names of entries of the
+        directory with passed ``path`` and flags telling if they are
+        directories.
+        """
+        return self.memoize('scandir', path, archives.scandir)
+
+    def read(self, path):
+        """Return the contents of the file with passed ``path`` as bytes."""
+        key = ('read', path)
+        if key in self._results:
+            return self._results[key]
+        source = archives.read(path)
+        if self.active and len(source) <= self.max_file_size:
+            self._results[key] = source
+        return source
+
+    def hexdigest(self, path):
+        """Return the hexdigest of the file with passed ``path``. Files larger
+        than :attr:`max_file_size` are hashed in chunks, so they are never
+        read into memory completely.
+        """
+        return self.memoize('hexdigest', path, self._hexdigest)
+
+    def memoize(self, kind, path, func):
+        """Return the result of ``func(path)``. While the session is active,
+        it is memoized for ``kind`` and ``path``.
+        """
+        if not self.active:
+            return func(path)
+        key = (kind, path)
+        if key not in self._results:
+            self._results[key] = func(path)
+        return self._results[key]
+
+    def _hexdigest(self, path):
+        if self.stat(path).st_size <= self.max_file_size:
+            return hashlib.new(self.hash_name, self.read(path)).hexdigest()
+        hash = hashlib.new(self.hash_name)
+        with archives.open_file(path) as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                hash.update(chunk)
+        return hash.hexdigest()
@@ -43,6 +43,30 @@ def unique(iterable, key=lambda x: x):
             yield item
 
 
+def scandir(path):
+    """Return the sorted list of two-tuples with names of entries of the
+    directory with passed ``path`` and flags telling if they are directories.
+    :func:`os.scandir` is used if it is available, so types of entries are
+    usually known without extra calls to :func:`os.stat`.
+    """
+    if not hasattr(os, 'scandir'):
+        return sorted((name, os.path.isdir(os.path.join(path, name)))
+                      for name in os.listdir(path))
+    return sorted((entry.name, entry.is_dir()) for entry in os.scandir(path))
+
+
+def get_stat_signature(stat):
+    """Return the signature of the file or directory from its ``stat``
+    result: a tuple with its modification time in nanoseconds, size and inode
+    number. If the signature is not changed, the file is considered not
+    changed.
+    """
+    mtime_ns = getattr(stat, 'st_mtime_ns', None)
+    if mtime_ns is None:
+        mtime_ns = int(stat.st_mtime * 1e9)
+    return (mtime_ns, stat.st_size, stat.st_ino)
+
+
 def get_condition_func(condition):
     if isinstance(condition, Callable):
         return condition
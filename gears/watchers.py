@@ -0,0 +1,260 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class BaseWatcher(object):
+    """Base class for file watchers. Watchers are used by
+    :meth:`~gears.environment.Environment.watch` to find out which files in
+    the directories given by ``paths`` are changed.
+
+    :param paths: the list of absolute paths of directories (and files, e.g.
+                  archives) to watch.
+    :param delay: the time in seconds to wait for other changes after the
+                  first one is detected, so several files saved by the editor
+                  at once are handled together.
+    """
+
+    def __init__(self, paths, delay=0.1):
+        self.paths = list(paths)
+        self.delay = delay
+
+    def wait(self, timeout=None):
+        """Block until some files are changed, and return the set of their
+        absolute paths. If ``timeout`` (in seconds) expires, empty set is
+        returned. ``None`` is returned if changes can't be tracked (e.g.
+        events were lost), so everything must be rebuilt.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PollingWatcher(BaseWatcher):
+    """The watcher that scans the watched directories every ``interval``
+    seconds and compares modification times and sizes of files.
+    """
+
+    def __init__(self, paths, delay=0.1, interval=1):
+        super(PollingWatcher, self).__init__(paths, delay)
+        self.interval = interval
+        self.snapshot = self.get_snapshot()
+
+    def wait(self, timeout=None):
+        started = time.time()
+        while True:
+            changed_paths = self.get_changed_paths()
+            if changed_paths:
+                time.sleep(self.delay)
+                return changed_paths | self.get_changed_paths()
+            if timeout is not None and time.time() - started >= timeout:
+                return set()
+            time.sleep(self.interval)
+
+    def get_changed_paths(self):
+        snapshot = self.get_snapshot()
+        changed_paths = set(snapshot) ^ set(self.snapshot)
+        for path, signature in snapshot.items():
+            if path in self.snapshot and self.snapshot[path] != signature:
+                changed_paths.add(path)
+        self.snapshot = snapshot
+        return changed_paths
+
+    def get_snapshot(self):
+        snapshot = {}
+        for root in self.paths:
+            if os.path.isfile(root):
+                self.add_to_snapshot(snapshot, root)
+                continue
+            for dirpath, dirnames, filenames in os.walk(root):
+                for filename in filenames:
+                    self.add_to_snapshot(snapshot, os.path.join(dirpath, filename))
+        return snapshot
+
+    def add_to_snapshot(self, snapshot, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        snapshot[path] = (stat.st_mtime, stat.st_size)
+
+
+class InotifyWatcher(BaseWatcher):
+    """The watcher that uses Linux inotify API to get notified about changed
+    files, so the time it takes to detect changes doesn't depend on the number
+    of watched files.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+            IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, paths, delay=0.1):
+        super(InotifyWatcher, self).__init__(paths, delay)
+        self.libc = get_libc()
+        self.fd = self.libc.inotify_init1(self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}
+        # Names of watched files in directories that are watched only for
+        # them, keyed by watch descriptors.
+        self.files = {}
+        self.lost = False
+        try:
+            for path in self.paths:
+                if os.path.isfile(path):
+                    self.add_file(path)
+                else:
+                    self.add_directory(path)
+        except OSError:
+            self.close()
+            raise
+
+    @classmethod
+    def is_available(cls):
+        if not sys.platform.startswith('linux'):
+            return False
+        libc = get_libc()
+        return libc is not None and hasattr(libc, 'inotify_init1')
+
+    def add_directory(self, path):
+        """Watch the directory with passed ``path`` and all its
+        subdirectories. :exc:`OSError` is raised if any of them can't be
+        watched (e.g. if ``max_user_watches`` limit is reached).
+        """
+        for dirpath, dirnames, filenames in os.walk(path):
+            wd = self.add_watch(dirpath)
+            self.directories[wd] = dirpath
+            self.files.pop(wd, None)
+
+    def add_file(self, path):
+        # Files are replaced by renaming, so their directory is watched.
+        dirpath, name = os.path.split(path)
+        wd = self.add_watch(dirpath)
+        if wd not in self.directories:
+            self.directories[wd] = dirpath
+            self.files[wd] = set()
+        if wd in self.files:
+            self.files[wd].add(name)
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(
+            self.fd, path.encode(sys.getfilesystemencoding()), self.MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, 'Unable to watch %s: %s' % (path, os.strerror(error)))
+        return wd
+
+    def wait(self, timeout=None):
+        if not self.poll(timeout):
+            return set()
+        changed_paths = set()
+        self.lost = False
+        while True:
+            data = self.read()
+            if data is None:
+                return None
+            changed_paths.update(self.parse(data))
+            if self.lost:
+                return None
+            if not self.poll(self.delay):
+                return changed_paths
+
+    def poll(self, timeout):
+        while True:
+            try:
+                return bool(select.select([self.fd], [], [], timeout)[0])
+            except (select.error, OSError) as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
+    def read(self):
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            offset += self.EVENT.size + length
+        return data
+
+    def parse(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if wd not in self.directories or not name:
+                continue
+            name = name.decode(sys.getfilesystemencoding())
+            if wd in self.files and name not in self.files[wd]:
+                continue
+            path = os.path.join(self.directories[wd], name)
+            if mask & self.IN_ISDIR:
+                if mask & self.IN_MOVED_FROM:
+                    # There are no events for files of the moved directory.
+                    self.lost = True
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    try:
+                        self.add_directory(path)
+                    except OSError as e:
+                        # Changes in the directory would be missed, so
+                        # everything is rebuilt.
+                        logger.warning('%s', e)
+                        self.lost = True
+                    for dirpath, dirnames, filenames in os.walk(path):
+                        for filename in filenames:
+                            yield os.path.join(dirpath, filename)
+                continue
+            yield path
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def get_libc():
+    name = ctypes.util.find_library('c')
+    if name is None:
+        return None
+    try:
+        return ctypes.CDLL(name, use_errno=True)
+    except OSError:
+        return None
+
+
+def get_watcher(paths, **kwargs):
+    """Return :class:`InotifyWatcher` for ``paths``, if inotify is available
+    and all paths can be watched, otherwise :class:`PollingWatcher` is
+    returned.
+    """
+    if InotifyWatcher.is_available():
+        try:
+            return InotifyWatcher(paths, **kwargs)
+        except OSError as e:
+            logger.warning('%s, polling is used instead of inotify.', e)
+    return PollingWatcher(paths, **kwargs)
@@ -0,0 +1,191 @@
+import os
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+from .cache.keys import get_namespace
+from .compat import replace
+
+
+def get_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+class FileWriter(object):
+    """Writes handled public assets to the :attr:`~gears.environment.Environment.root`
+    directory of the environment.
+
+    The source is written only once, to a temporary file, that is then renamed
+    to the first path, so readers never see partially written files. Other
+    paths (e.g. the fingerprinted one) are hard links to the first path. Files
+    that already contain the same source are left untouched.
+
+    If gzipping is enabled in the environment, compressed copies of gzippable
+    assets are saved by precompressors, registered for the asset MIME type
+    (see :class:`~gears.environment.Precompressors`). Sources larger than
+    :attr:`pool_threshold` are precompressed in a pool of threads, so
+    :meth:`wait` must be called to make sure that all copies are written.
+
+    :param environment: an instance of :class:`~gears.environment.Environment`
+                        class.
+    :param threads: the number of threads used to precompress large sources.
+                    Defaults to the number of CPUs.
+    """
+
+    #: Sources of this size in bytes or larger are precompressed in the pool of
+    #: threads.
+    pool_threshold = 256 * 1024
+
+    def __init__(self, environment, threads=None):
+        self.environment = environment
+        self.threads = threads
+
+        #: The umask of the process, used for permissions of written files.
+        #: It is read once, because reading it changes the umask for the
+        #: whole process for a moment, while other threads create files.
+        self.umask = get_umask()
+
+        self._pool = None
+        self._pool_pid = None
+        self._results = []
+
+    @property
+    def pool(self):
+        # Threads don't survive fork, so worker processes of the build
+        # scheduler create their own pools.
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPool(self.threads)
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def write(self, paths, source, gzippable=False, mimetype=None):
+        """Write ``source`` to all ``paths``, relative to the root directory,
+        and save its compressed copies, if the source is ``gzippable``.
+        """
+        filenames = self.get_filenames(paths)
+        if not self.contains(filenames[0], source):
+            self.write_file(filenames[0], source)
+        self.link_files(filenames, source)
+        for precompressor in self.get_precompressors(gzippable, mimetype):
+            if len(source) >= self.pool_threshold:
+                self._results.append(self.pool.apply_async(
+                    self.precompress, (filenames, source, precompressor)))
+            else:
+                self.precompress(filenames, source, precompressor)
+
+    def wait(self):
+        """Wait until all compressed copies, made in the pool of threads, are
+        written.
+        """
+        results, self._results = self._results, []
+        for result in results:
+            result.get()
+
+    def is_written(self, paths, source, gzippable=False, mimetype=None):
+        """Returns ``True`` if all files that would be written by :meth:`write`
+        exist. Their contents are not checked. Compressed copies that were
+        not saved for the same source (e.g. because they were not smaller
+        than the source) are not expected to exist.
+        """
+        filenames = self.get_filenames(paths)
+        for precompressor in self.get_precompressors(gzippable, mimetype):
+            if precompressor.accepts(source) and not self.is_skipped(source, precompressor):
+                filenames.extend(f + precompressor.extension for f in filenames[:len(paths)])
+        return all(os.path.exists(f) for f in filenames)
+
+    def is_skipped(self, source, precompressor):
+        """Returns ``True`` if the compressed copy of ``source`` made by
+        ``precompressor`` was not saved, as the precompressor returned
+        ``None``. Skipped copies are remembered in the cache of the
+        environment.
+        """
+        return bool(self.environment.cache.get(self._get_skipped_key(source, precompressor)))
+
+    def precompress(self, filenames, source, precompressor):
+        filenames = [f + precompressor.extension for f in filenames]
+        if not self.contains(filenames[0], source, precompressor.decompress):
+            compressed_source = precompressor(source)
+            if compressed_source is None:
+                # Remove the copy left from previous builds, so it is not
+                # served instead of the new source.
+                self.remove_files(filenames)
+                self.environment.cache.set(
+                    self._get_skipped_key(source, precompressor), True)
+                return
+            self.write_file(filenames[0], compressed_source)
+        self.link_files(filenames, source, precompressor.decompress)
+
+    def _get_skipped_key(self, source, precompressor):
+        return 'skipped_copy:%s:%s' % (get_namespace([precompressor]),
+                                       self.environment.get_hexdigest(source))
+
+    def get_filenames(self, paths):
+        return [os.path.join(self.environment.root, p) for p in paths]
+
+    def get_precompressors(self, gzippable, mimetype):
+        if not (self.environment.gzip and gzippable):
+            return []
+        return self.environment.precompressors.get(mimetype)
+
+    def contains(self, filename, source, decompress=None):
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return False
+        if decompress is not None:
+            try:
+                data = decompress(data)
+            except Exception:
+                return False
+        return data == source
+
+    def write_file(self, filename, source):
+        self.makedirs(os.path.dirname(filename))
+        fd, temp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(filename), prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(source)
+            os.chmod(temp_filename, 0o666 & ~self.umask)
+            replace(temp_filename, filename)
+        finally:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+
+    def link_files(self, filenames, source, decompress=None):
+        for link_name in filenames[1:]:
+            if not self.contains(link_name, source, decompress):
+                self.link(filenames[0], link_name)
+
+    def link(self, filename, link_name):
+        self.makedirs(os.path.dirname(link_name))
+        temp_link_name = '{}.{}.tmp'.format(link_name, os.getpid())
+        try:
+            os.link(filename, temp_link_name)
+        except (AttributeError, OSError):
+            # Hard links are not supported by the platform or file system.
+            with open(filename, 'rb') as f:
+                self.write_file(link_name, f.read())
+            return
+        try:
+            replace(temp_link_name, link_name)
+        finally:
+            if os.path.lexists(temp_link_name):
+                os.remove(temp_link_name)
+
+    def remove_files(self, filenames):
+        for filename in filenames:
+            if os.path.lexists(filename):
+                os.remove(filename)
+
+    def makedirs(self, path):
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError:
+                if not os.path.isdir(path):
+                    raise
+        elif not os.path.isdir(path):
+            raise OSError("%s exists and is not a directory." % path)
@@ -0,0 +1,4 @@
+//= public
+//= params mode=check
+
+var check = 1;
@@ -0,0 +1 @@
+var shared = 1;
@@ -0,0 +1,3 @@
+//= public
+
+var lonely = 1;
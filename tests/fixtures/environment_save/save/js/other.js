@@ -0,0 +1,4 @@
+//= public
+//= require lib/shared
+
+var other = 1;
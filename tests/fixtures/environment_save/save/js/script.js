@@ -0,0 +1,3 @@
+//= require lib/shared
+
+var script = 1;
@@ -0,0 +1,145 @@
+import os
+import shutil
+import stat
+import tempfile
+import zipfile
+
+from gears.archives import ZipArchive, close_archive, read
+from gears.assets import build_asset
+from gears.environment import Environment
+from gears.exceptions import FileNotFound
+from gears.finders import ArchiveFinder, FileSystemFinder
+
+from .helpers import FIXTURES_DIR
+
+from unittest2 import TestCase
+
+
+SAVE_DIR = os.path.join(FIXTURES_DIR, 'environment_save', 'save')
+
+
+class ArchiveTestCase(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'assets.zip')
+        with zipfile.ZipFile(self.path, 'w') as archive:
+            archive.writestr('js/stored.js', b'var a = 1;', zipfile.ZIP_STORED)
+            archive.writestr('js/lib/deflated.js', b'var b = 2;' * 100,
+                             zipfile.ZIP_DEFLATED)
+            archive.writestr('images/', b'')
+
+    def tearDown(self):
+        close_archive(self.path)
+        shutil.rmtree(self.root)
+
+
+class ZipArchiveTests(ArchiveTestCase):
+
+    def setUp(self):
+        super(ZipArchiveTests, self).setUp()
+        self.archive = ZipArchive(self.path)
+
+    def tearDown(self):
+        self.archive.close()
+        super(ZipArchiveTests, self).tearDown()
+
+    def test_reads_members(self):
+        self.assertEqual(self.archive.read('js/stored.js'), b'var a = 1;')
+        self.assertEqual(self.archive.read('js/lib/deflated.js'), b'var b = 2;' * 100)
+        with self.assertRaises(IOError):
+            self.archive.read('js/missing.js')
+
+    def test_stat(self):
+        result = self.archive.stat('js/stored.js')
+        self.assertTrue(stat.S_ISREG(result.st_mode))
+        self.assertEqual(result.st_size, 10)
+        self.assertTrue(stat.S_ISDIR(self.archive.stat('js/lib').st_mode))
+        with self.assertRaises(OSError):
+            self.archive.stat('js/missing.js')
+
+    def test_scandir(self):
+        self.assertEqual(self.archive.scandir(''), [('images', True), ('js', True)])
+        self.assertEqual(self.archive.scandir('js'), [('lib', True), ('stored.js', False)])
+
+
+class ArchiveFinderTests(ArchiveTestCase):
+
+    def setUp(self):
+        super(ArchiveFinderTests, self).setUp()
+        self.finder = ArchiveFinder([self.path])
+
+    def test_find(self):
+        path = self.finder.find('js/stored.js')
+        self.assertEqual(path, os.path.join(self.path, 'js', 'stored.js'))
+        self.assertEqual(read(path), b'var a = 1;')
+        with self.assertRaises(FileNotFound):
+            self.finder.find('js/missing.js')
+
+    def test_list(self):
+        self.assertItemsEqual(self.finder.list('js/**'), [
+            ('js/stored.js', os.path.join(self.path, 'js', 'stored.js')),
+            ('js/lib/deflated.js', os.path.join(self.path, 'js', 'lib', 'deflated.js')),
+        ])
+
+    def test_refresh(self):
+        self.finder.find('js/stored.js')
+        with zipfile.ZipFile(self.path, 'a') as archive:
+            archive.writestr('js/new.js', b'')
+        self.finder.refresh(['/other/path'])
+        with self.assertRaises(FileNotFound):
+            self.finder.find('js/new.js')
+        self.finder.refresh([self.path])
+        self.finder.find('js/new.js')
+
+    def test_saves_the_same_assets_as_file_system_finder(self):
+        archive_path = os.path.join(self.root, 'save.zip')
+        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for dirpath, dirnames, filenames in os.walk(SAVE_DIR):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    archive.write(path, os.path.relpath(path, SAVE_DIR))
+        try:
+            for name, finder in (('files', FileSystemFinder([SAVE_DIR])),
+                                 ('archive', ArchiveFinder([archive_path]))):
+                environment = Environment(os.path.join(self.root, name))
+                environment.finders.register(finder)
+                environment.register_defaults()
+                environment.save()
+            self.assertEqual(self.list_files(os.path.join(self.root, 'archive')),
+                             self.list_files(os.path.join(self.root, 'files')))
+        finally:
+            close_archive(archive_path)
+
+    def test_loads_cached_requirements_from_closed_archives(self):
+        directory = os.path.join(self.root, 'assets', 'js')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'app.js'), 'w') as f:
+            f.write('//= require lib/deflated\n')
+        environment = Environment(os.path.join(self.root, 'static'))
+        environment.finders.register(FileSystemFinder([os.path.dirname(directory)]))
+        environment.finders.register(ArchiveFinder([self.path]))
+        environment.register_defaults()
+        source = bytes(build_asset(environment, 'js/app.js'))
+        close_archive(self.path)
+        self.assertEqual(bytes(build_asset(environment, 'js/app.js')), source)
+
+    def test_watches_and_rebuilds_archives(self):
+        environment = Environment(os.path.join(self.root, 'static'),
+                                  public_assets=[r'.*\.js$'])
+        environment.finders.register(ArchiveFinder([self.path]))
+        environment.register_defaults()
+        self.assertEqual(environment._get_watched_paths(), [self.path])
+        environment.save()
+        with zipfile.ZipFile(self.path, 'a') as archive:
+            archive.writestr('js/new.js', b'var c = 3;')
+        self.assertIn('js/new.js', environment.rebuild([self.path]))
+
+    def list_files(self, root):
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename != '.manifest.json':
+                    files[os.path.relpath(path, root)] = read(path)
+        return files
@@ -230,3 +230,63 @@ class AssetAttributesTests(TestCase):
         check('css/style.css', [first_processor, second_processor])
         check('css/style.css.styl', [first_processor, second_processor])
         check('css/style.styl', [first_processor, second_processor])
+
+    def test_cache_namespace(self):
+        self.environment.mimetypes.register('.css', 'text/css')
+        self.environment.mimetypes.register('.js', 'application/javascript')
+        self.environment.compilers.register('.styl', self.stylus_compiler)
+
+        def get_namespaces():
+            return [self.create_attributes(path).cache_namespace
+                    for path in ('js/script.js', 'css/style.styl')]
+
+        js_namespace, css_namespace = get_namespaces()
+        self.assertNotEqual(js_namespace, css_namespace)
+        self.environment.postprocessors.register('text/css', TemplateCompiler.as_handler())
+        self.assertEqual(get_namespaces()[0], js_namespace)
+        self.assertNotEqual(get_namespaces()[1], css_namespace)
+
+    def test_cache_namespace_depends_on_handler_options_and_version(self):
+        self.environment.mimetypes.register('.css', 'text/css')
+
+        def get_namespace(handler):
+            self.environment.postprocessors.clear()
+            self.environment.postprocessors.register('text/css', handler)
+            return self.create_attributes('css/style.css').cache_namespace
+
+        namespace = get_namespace(TemplateCompiler.as_handler())
+        self.assertEqual(get_namespace(TemplateCompiler.as_handler()), namespace)
+        self.assertNotEqual(get_namespace(TemplateCompiler.as_handler(option=1)),
+                            namespace)
+
+        class NewTemplateCompiler(TemplateCompiler):
+            version = 2
+
+        NewTemplateCompiler.__name__ = 'TemplateCompiler'
+        self.assertNotEqual(get_namespace(NewTemplateCompiler.as_handler()),
+                            namespace)
+
+    def test_cache_namespace_depends_on_handler_instance_options(self):
+        self.environment.mimetypes.register('.css', 'text/css')
+
+        def get_namespace(handler):
+            self.environment.postprocessors.clear()
+            self.environment.postprocessors.register('text/css', handler)
+            return self.create_attributes('css/style.css').cache_namespace
+
+        handler = TemplateCompiler()
+        namespace = get_namespace(handler)
+        handler.asset = Mock()
+        self.assertEqual(get_namespace(handler), namespace)
+        self.assertEqual(get_namespace(TemplateCompiler()), namespace)
+        self.assertNotEqual(get_namespace(TemplateCompiler(option=1)), namespace)
+
+    def test_compressed_cache_namespace(self):
+        self.environment.mimetypes.register('.js', 'application/javascript')
+        attributes = self.create_attributes('js/script.js')
+        namespace = attributes.compressed_cache_namespace
+        self.environment.compressors.register(
+            'application/javascript', TemplateCompiler.as_handler())
+        new_attributes = self.create_attributes('js/script.js')
+        self.assertEqual(new_attributes.cache_namespace, attributes.cache_namespace)
+        self.assertNotEqual(new_attributes.compressed_cache_namespace, namespace)
@@ -1,5 +1,7 @@
 import os
-from gears.assets import Dependency
+import shutil
+import tempfile
+from gears.assets import Dependency, DirectoryDependency
 from .helpers import GearsTestCase
 
 
@@ -26,3 +28,82 @@ class AssetDependencyTests(GearsTestCase):
         fixture_path = self.get_fixture_path(fixture)
         environment = self.get_environment(fixture)
         Dependency(environment, os.path.join(fixture_path, 'image.png'))
+
+    def test_does_not_hash_unchanged_files(self):
+        fixture = 'handles_binary_files'
+        path = os.path.join(self.get_fixture_path(fixture), 'image.png')
+        environment = self.get_environment(fixture)
+        Dependency(environment, path)
+        dependency = Dependency(environment, path)
+        self.assertFalse(dependency.expired)
+        self.assertNotIn('hexdigest', dependency.__dict__)
+
+    def test_hashes_unchanged_files_if_sources_are_verified(self):
+        fixture = 'handles_binary_files'
+        path = os.path.join(self.get_fixture_path(fixture), 'image.png')
+        environment = self.get_environment(fixture)
+        environment.verify_sources = True
+        Dependency(environment, path)
+        dependency = Dependency(environment, path)
+        self.assertFalse(dependency.expired)
+        self.assertIn('hexdigest', dependency.__dict__)
+
+    def test_detects_changed_files(self):
+        fixture = 'handles_binary_files'
+        environment = self.get_environment(fixture)
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'a')
+            f.flush()
+            Dependency(environment, f.name)
+            f.seek(0)
+            f.write(b'b')
+            f.flush()
+            os.utime(f.name, (0, 0))
+            self.assertTrue(Dependency(environment, f.name).expired)
+
+
+class DirectoryDependencyTests(GearsTestCase):
+
+    fixtures_root = 'asset_dependency'
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.environment = self.get_environment('handles_directories')
+        self.create('a.js')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def create(self, name):
+        with open(os.path.join(self.path, name), 'w') as f:
+            f.write('')
+
+    def get_dependency(self, pattern='*', recursive=False):
+        return DirectoryDependency(self.environment, self.path, pattern,
+                                   'application/javascript', recursive)
+
+    def test_ignores_files_that_do_not_match(self):
+        self.get_dependency()
+        self.create('image.png')
+        self.create('style.css')
+        self.assertFalse(self.get_dependency().expired)
+
+    def test_detects_added_matching_files(self):
+        self.get_dependency()
+        self.create('b.js')
+        self.assertTrue(self.get_dependency().expired)
+
+    def test_matches_basename_pattern(self):
+        self.get_dependency('a')
+        self.create('b.js')
+        self.assertFalse(self.get_dependency('a').expired)
+        self.create('index.js')
+        self.assertTrue(self.get_dependency('a').expired)
+
+    def test_recursive_dependency_detects_subdirectories(self):
+        self.get_dependency(recursive=True)
+        os.mkdir(os.path.join(self.path, 'lib'))
+        self.assertTrue(self.get_dependency(recursive=True).expired)
+
+    def test_is_not_equal_to_dependency_with_other_pattern(self):
+        self.assertNotEqual(self.get_dependency('*'), self.get_dependency('a'))
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+
+from gears.graph import AssetGraph
+from unittest2 import TestCase
+
+
+class AssetGraphTests(TestCase):
+
+    def setUp(self):
+        self.graph = AssetGraph()
+        self.graph.add('js/script.js', '/assets/js/script.js', [
+            '/assets/js/script.js',
+            '/assets/js/lib/shared.js',
+            '/assets/js/lib',
+        ])
+        self.graph.add('js/other.js', '/assets/js/other.js', [
+            '/assets/js/other.js',
+            '/assets/js/lib/shared.js',
+        ])
+
+    def test_find_by_source(self):
+        self.assertEqual(self.graph.find(['/assets/js/other.js']),
+                         set(['js/other.js']))
+
+    def test_find_by_shared_source(self):
+        self.assertEqual(self.graph.find(['/assets/js/lib/shared.js']),
+                         set(['js/script.js', 'js/other.js']))
+
+    def test_find_by_directory(self):
+        self.assertEqual(self.graph.find(['/assets/js/lib/new.js']),
+                         set(['js/script.js']))
+
+    def test_find_nothing(self):
+        self.assertEqual(self.graph.find(['/assets/css/style.css']), set())
+
+    def test_replace_sources(self):
+        self.graph.add('js/other.js', '/assets/js/other.js', ['/assets/js/other.js'])
+        self.assertEqual(self.graph.find(['/assets/js/lib/shared.js']),
+                         set(['js/script.js']))
+
+    def test_remove(self):
+        self.graph.remove('js/script.js')
+        self.assertNotIn('js/script.js', self.graph)
+        self.assertFalse(self.graph.is_source('/assets/js/lib'))
+        self.assertTrue(self.graph.is_source('/assets/js/lib/shared.js'))
+
+    def test_to_dict_and_from_dict(self):
+        graph = AssetGraph.from_dict(self.graph.to_dict())
+        self.assertEqual(graph.to_dict(), self.graph.to_dict())
+        self.assertEqual(graph.find(['/assets/js/lib/shared.js']),
+                         set(['js/script.js', 'js/other.js']))
+
+    def test_dump_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'gears', 'graph.json')
+            self.assertEqual(len(AssetGraph.load(path)), 0)
+            self.graph.dump(path)
+            self.assertEqual(AssetGraph.load(path).to_dict(), self.graph.to_dict())
+        finally:
+            shutil.rmtree(directory)
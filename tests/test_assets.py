@@ -1,10 +1,14 @@
+from contextlib import contextmanager
+
+from gears.asset_attributes import AssetAttributes
 from gears.assets import (
-    CircularDependencyError, BaseAsset, Asset, StaticAsset, build_asset,
-    strip_fingerprint
+    CircularDependencyError, BaseAsset, Asset, CheckAsset, StaticAsset,
+    build_asset, strip_fingerprint
 )
+from gears.cache import FileBasedCache, SimpleCache
 from gears.compat import str, bytes
 
-from mock import sentinel, Mock
+from mock import patch, sentinel, Mock
 from unittest2 import TestCase
 from .helpers import GearsTestCase
 
@@ -30,6 +34,75 @@ class AssetTests(GearsTestCase):
         asset = self.get_asset('unicode_support')
         bytes(asset)
 
+    def test_locks_cache_key_while_building(self):
+        environment = self.get_environment('unicode_support')
+        environment.cache.lock = Mock(wraps=FileBasedCache(None).lock)
+        asset = self.get_asset('unicode_support', environment)
+        environment.cache.lock.assert_any_call(asset._get_cache_key())
+
+    def test_does_not_lock_cached_assets(self):
+        environment = self.get_environment('unicode_support')
+        self.get_asset('unicode_support', environment)
+        environment.cache.lock = Mock(wraps=FileBasedCache(None).lock)
+        self.get_asset('unicode_support', environment)
+        self.assertFalse(environment.cache.lock.called)
+
+    def test_reads_cache_again_under_lock(self):
+        environment = self.get_environment('unicode_support')
+        self.get_asset('unicode_support', environment)
+        data = dict(environment.cache)
+        environment.cache.clear()
+
+        @contextmanager
+        def lock(key):
+            # Another process builds the asset while the lock is awaited.
+            environment.cache.update(data)
+            yield
+
+        environment.cache.lock = lock
+        with patch.object(Asset, '_save_to_cache') as save_to_cache:
+            asset = self.get_asset('unicode_support', environment)
+        self.assertFalse(save_to_cache.called)
+        self.assertEqual(str(asset), self.get_output('unicode_support'))
+
+    def test_reads_cached_bundle_in_batches(self):
+        environment = self.get_environment('unicode_support')
+        environment.cache = BatchCache()
+        str(self.get_asset('unicode_support', environment))
+        environment.cache.get = Mock(wraps=environment.cache.get)
+        environment.cache.get_many = Mock(wraps=environment.cache.get_many)
+        asset = self.get_asset('unicode_support', environment)
+        self.assertEqual(str(asset), self.get_output('unicode_support'))
+        self.assertFalse(environment.cache.get.called)
+        self.assertEqual(environment.cache.get_many.call_count, 2)
+
+    def test_reads_cached_data_once(self):
+        environment = self.get_environment('unicode_support')
+        self.get_asset('unicode_support', environment)
+        cache = Mock(wraps=environment.cache)
+        source_path = self.get_source_path('unicode_support')
+        attributes = AssetAttributes(environment, 'source.js')
+        asset = Asset(attributes, source_path, cache=cache)
+        asset.params
+        asset.dependencies
+        key = asset._get_cache_key()
+        calls = [c for c in cache.get.call_args_list if c[0][0] == key]
+        self.assertEqual(len(calls), 1)
+
+    def test_rereads_cached_data_after_saving(self):
+        asset = self.get_asset('unicode_support')
+        data = asset.cached_data
+        asset.cache.set(asset._get_cache_key(), None)
+        self.assertIs(asset.cached_data, data)
+        asset._save_to_cache()
+        self.assertEqual(asset.cached_data, asset.to_dict())
+
+
+class BatchCache(SimpleCache):
+
+    def get_many(self, keys):
+        return dict((key, self[key]) for key in keys if key in self)
+
 
 class StaticAssetTests(GearsTestCase):
 
@@ -55,10 +128,28 @@ class StaticAssetTests(GearsTestCase):
         bytes(asset)
 
 
+class CheckAssetTests(GearsTestCase):
+
+    fixtures_root = 'assets'
+
+    def test_params(self):
+        asset = self.get_asset('check_asset', asset_class=CheckAsset)
+        self.assertEqual(asset.params, {'public': True, 'mode': 'check'})
+
+    def test_caches_params(self):
+        environment = self.get_environment('check_asset')
+        self.get_asset('check_asset', environment, asset_class=CheckAsset)
+        with patch('gears.assets.DirectivesParser') as parser:
+            asset = self.get_asset('check_asset', environment, asset_class=CheckAsset)
+        self.assertFalse(parser.called)
+        self.assertTrue(asset.is_public)
+
+
 class HexdigestPathTests(TestCase):
 
     def get_asset(self, logical_path):
         attributes = Mock(logical_path=logical_path)
+        attributes.environment.fingerprint_length = 40
         asset = BaseAsset(attributes, sentinel.absolute_path)
         asset.final_hexdigest = '123456'
         return asset
@@ -71,6 +162,11 @@ class HexdigestPathTests(TestCase):
         check('css/style.css', 'css/style.123456.css')
         check('css/style.min.css', 'css/style.min.123456.css')
 
+    def test_truncates_fingerprint(self):
+        asset = self.get_asset('css/style.css')
+        asset.attributes.environment.fingerprint_length = 4
+        self.assertEqual(asset.hexdigest_path, 'css/style.1234.css')
+
 
 class BuildAssetTests(GearsTestCase):
 
@@ -101,3 +197,8 @@ class StripFingerprintTests(TestCase):
 
     def test_skips_paths_without_fingerprint(self):
         self.assertEqual(strip_fingerprint('source.js'), 'source.js')
+
+    def test_strips_fingerprint_of_given_length(self):
+        path = 'source.38976434f000bf44.js'
+        self.assertEqual(strip_fingerprint(path, 16), 'source.js')
+        self.assertEqual(strip_fingerprint(path), path)
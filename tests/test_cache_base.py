@@ -0,0 +1,64 @@
+from gears.cache import SimpleCache
+from gears.cache.base import PrefetchedCache, get_many, set_many
+
+from mock import MagicMock, Mock
+from unittest2 import TestCase
+
+
+class BatchCache(SimpleCache):
+
+    def get_many(self, keys):
+        return dict((key, self[key]) for key in keys if key in self)
+
+    def set_many(self, mapping):
+        self.update(mapping)
+
+
+class GetManyTests(TestCase):
+
+    def test_uses_get_many_of_cache(self):
+        cache = BatchCache(a=1)
+        cache.get = Mock()
+        self.assertEqual(get_many(cache, ['a', 'b']), {'a': 1})
+        self.assertFalse(cache.get.called)
+
+    def test_falls_back_to_get(self):
+        self.assertEqual(get_many(SimpleCache(a=1), ['a', 'b']), {'a': 1})
+
+    def test_set_many(self):
+        for cache in (SimpleCache(), BatchCache()):
+            set_many(cache, {'a': 1, 'b': 2})
+            self.assertEqual(cache, {'a': 1, 'b': 2})
+
+
+class PrefetchedCacheTests(TestCase):
+
+    def setUp(self):
+        self.backend = BatchCache(a=1)
+        self.backend.get = Mock(wraps=self.backend.get)
+        self.cache = PrefetchedCache(self.backend, ['a', 'b'])
+
+    def test_serves_prefetched_values_and_misses(self):
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertFalse(self.backend.get.called)
+        self.assertIsNone(self.cache.get('c'))
+        self.backend.get.assert_called_once_with('c')
+
+    def test_set_replaces_prefetched_value(self):
+        self.cache.set('a', 2)
+        self.assertEqual(self.backend['a'], 2)
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_rereads_misses_after_lock(self):
+        self.backend.lock = MagicMock()
+        self.backend['b'] = 2
+        with self.cache.lock('b'):
+            self.assertEqual(self.cache.get('b'), 2)
+        self.backend.lock.assert_called_once_with('b')
+
+    def test_rereads_values_after_lock(self):
+        self.backend.lock = MagicMock()
+        self.backend['a'] = 2
+        with self.cache.lock('a'):
+            self.assertEqual(self.cache.get('a'), 2)
@@ -0,0 +1,50 @@
+from gears.cache import CacheStats, SimpleCache, StatsCache
+
+from mock import MagicMock
+from unittest2 import TestCase
+
+
+class StatsCacheTests(TestCase):
+
+    def setUp(self):
+        self.backend = SimpleCache()
+        self.cache = StatsCache(self.backend)
+
+    def test_counts_hits_misses_and_sets(self):
+        self.cache.get('asset:/a:data')
+        self.cache.set('asset:/a:data', {'mtime': 1})
+        self.cache.get('asset:/a:data')
+        self.cache.get('dependency:/a')
+        stats = self.cache.stats.as_dict()
+        self.assertEqual(stats['data']['hits'], 1)
+        self.assertEqual(stats['data']['misses'], 1)
+        self.assertEqual(stats['data']['sets'], 1)
+        self.assertEqual(stats['dependency']['misses'], 1)
+        self.assertEqual(stats['total']['misses'], 2)
+
+    def test_counts_bytes(self):
+        self.cache.set('a', 'x' * 1000)
+        self.cache.get('a')
+        stats = self.cache.stats.as_dict()['other']
+        self.assertGreaterEqual(stats['bytes_written'], 1000)
+        self.assertEqual(stats['bytes_read'], stats['bytes_written'])
+
+    def test_reset(self):
+        self.cache.get('a')
+        self.cache.stats.reset()
+        self.assertEqual(self.cache.stats.as_dict()['total']['misses'], 0)
+
+    def test_merge(self):
+        stats = CacheStats()
+        stats.add('data', hits=2)
+        self.cache.stats.add('data', hits=1, misses=1)
+        self.cache.stats.merge(stats.as_dict())
+        data = self.cache.stats.as_dict()
+        self.assertEqual(data['data']['hits'], 3)
+        self.assertEqual(data['total']['hits'], 3)
+
+    def test_lock_uses_wrapped_cache(self):
+        self.backend.lock = MagicMock()
+        with self.cache.lock('a'):
+            pass
+        self.backend.lock.assert_called_once_with('a')
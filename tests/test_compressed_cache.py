@@ -0,0 +1,55 @@
+from gears.cache import CompressedCache, SimpleCache
+from gears.cache.compressed import CompressedValue, lzma_available
+from gears.exceptions import ImproperlyConfigured
+
+from mock import MagicMock
+from unittest2 import TestCase, skipUnless
+
+
+class CompressedCacheTests(TestCase):
+
+    def setUp(self):
+        self.backend = SimpleCache()
+        self.cache = CompressedCache(self.backend, threshold=100)
+        self.value = {'source': 'var a = 1;\n' * 100, 'mtime': 1}
+
+    def test_compresses_large_values(self):
+        self.cache.set('asset:/a:data', self.value)
+        self.assertIsInstance(self.backend.get('asset:/a:data'), CompressedValue)
+        self.assertEqual(self.cache.get('asset:/a:data'), self.value)
+
+    def test_does_not_compress_small_values(self):
+        self.cache.set('asset:/a:data', {'mtime': 1})
+        self.assertEqual(self.backend.get('asset:/a:data'), {'mtime': 1})
+        self.assertEqual(self.cache.get('asset:/a:data'), {'mtime': 1})
+        self.assertIsNone(self.cache.ratio)
+
+    def test_returns_none_if_key_not_found(self):
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_returns_none_if_value_is_corrupted(self):
+        self.backend.set('a', CompressedValue('zlib', b'corrupted'))
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_ratio(self):
+        self.cache.set('asset:/a:data', self.value)
+        self.assertGreater(self.cache.original_size, self.cache.compressed_size)
+        self.assertEqual(self.cache.ratio,
+                         float(self.cache.original_size) / self.cache.compressed_size)
+
+    @skipUnless(lzma_available, 'lzma is not available')
+    def test_lzma(self):
+        cache = CompressedCache(self.backend, threshold=100, method='lzma')
+        cache.set('asset:/a:data', self.value)
+        self.assertEqual(self.backend.get('asset:/a:data').method, 'lzma')
+        self.assertEqual(cache.get('asset:/a:data'), self.value)
+
+    def test_unknown_method(self):
+        with self.assertRaises(ImproperlyConfigured):
+            CompressedCache(self.backend, method='bz2')
+
+    def test_lock_uses_wrapped_cache(self):
+        self.backend.lock = MagicMock()
+        with self.cache.lock('a'):
+            pass
+        self.backend.lock.assert_called_once_with('a')
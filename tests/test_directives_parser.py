@@ -1,3 +1,4 @@
+import codecs
 import os
 from gears.directives_parser import DirectivesParser
 from unittest2 import TestCase
@@ -53,6 +54,35 @@ class DirectivesParserTests(GearsTestCase):
         self.check_asset('non_header_comments', ['require jquery'])
 
 
+class DirectivesParserReadHeaderTests(GearsTestCase):
+
+    fixtures_root = 'directives_parser'
+
+    def read_header(self, fixture):
+        with codecs.open(self.get_source_path(fixture), encoding='utf-8') as f:
+            return DirectivesParser().read_header(f, chunk_size=4)
+
+    def test_stops_after_header(self):
+        header = self.read_header('multiline_comments')
+        self.assertTrue(header.startswith('/*\n *= require reset'))
+        self.assertNotIn('color', header)
+
+    def test_reads_multiple_comments(self):
+        header = self.read_header('multiple_comments')
+        self.assertEqual(DirectivesParser().parse(header)[0], [
+            'require jquery',
+            'require underscore',
+            'require backbone',
+            'require models',
+            'require collections',
+            'require views',
+        ])
+
+    def test_reads_file_without_header(self):
+        self.assertEqual(self.read_header('no_directives'),
+                         self.get_source('no_directives')[:4])
+
+
 class DirectivesParserHeaderPatternTests(TestCase):
 
     def setUp(self):
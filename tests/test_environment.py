@@ -6,10 +6,10 @@ from contextlib import contextmanager
 from gears.asset_attributes import AssetAttributes
 from gears.compat import str
 from gears.environment import Environment
-from gears.exceptions import FileNotFound
+from gears.exceptions import FileNotFound, ImproperlyConfigured
 from gears.finders import FileSystemFinder
 
-from mock import Mock
+from mock import Mock, patch
 from unittest2 import TestCase
 
 
@@ -116,6 +116,69 @@ class EnvironmentFindTests(TestCase):
         with self.assertRaises(FileNotFound):
             self.environment.find('js/views.js', logical=True)
 
+    def test_find_caches_results_during_build(self):
+        finder = self.environment.finders[0]
+        finder.find = Mock(side_effect=finder.find)
+        with self.environment.session:
+            for i in range(2):
+                self.environment.find('js/models.js', logical=True)
+                with self.assertRaises(FileNotFound):
+                    self.environment.find('js/views.js', logical=True)
+            calls = finder.find.call_count
+            self.environment.find('js/models.js', logical=True)
+            self.assertEqual(finder.find.call_count, calls)
+            self.environment.clear_find_cache()
+            self.environment.find('js/models.js', logical=True)
+            self.assertGreater(finder.find.call_count, calls)
+        calls = finder.find.call_count
+        self.environment.find('js/script.js')
+        self.environment.find('js/script.js')
+        self.assertEqual(finder.find.call_count, calls + 2)
+
+    def test_find_returns_new_asset_attributes(self):
+        with self.environment.session:
+            attrs, path = self.environment.find('js/script.js')
+            self.assertIsNot(self.environment.find('js/script.js')[0], attrs)
+
+    def test_find_cache_is_invalidated_by_registries(self):
+        finder = Mock()
+        finder.find.return_value = '/other/js/views.js'
+        with self.environment.session:
+            with self.assertRaises(FileNotFound):
+                self.environment.find('js/views.js', logical=True)
+            self.environment.finders.register(finder)
+            attrs, path = self.environment.find('js/views.js', logical=True)
+            self.assertEqual(path, '/other/js/views.js')
+            state = self.environment._get_find_cache_state()
+            self.environment.compressors.register('application/javascript', Mock())
+            self.environment.postprocessors.register('text/css', Mock())
+            self.assertNotEqual(self.environment._get_find_cache_state(), state)
+
+    @patch('gears.environment.exists', return_value=True)
+    def test_find_cache_ttl(self, exists):
+        self.environment.find_cache_ttl = 60
+        finder = self.environment.finders[0]
+        finder.find = Mock(side_effect=finder.find)
+        self.environment.find('js/script.js')
+        self.environment.find('js/script.js')
+        self.assertEqual(finder.find.call_count, 1)
+        exists.return_value = False
+        finder.find.side_effect = FileNotFound('js/script.js')
+        with self.assertRaises(FileNotFound):
+            self.environment.find('js/script.js')
+        self.environment.find_cache_ttl = 0
+        with self.assertRaises(FileNotFound):
+            self.environment.find('js/script.js')
+        self.assertEqual(finder.find.call_count, 3)
+
+    def test_find_cache_size_is_limited(self):
+        self.environment.find_cache_ttl = 60
+        self.environment.find_cache_size = 3
+        for i in range(10):
+            with self.assertRaises(FileNotFound):
+                self.environment.find('js/missing%d.js' % i)
+        self.assertLessEqual(len(self.environment._find_cache), 3)
+
     def test_save_file(self):
         source = str('hello world').encode('utf-8')
         with remove_static_dir():
@@ -123,6 +186,33 @@ class EnvironmentFindTests(TestCase):
             with open(os.path.join(STATIC_DIR, 'js', 'script.js'), 'rb') as f:
                 self.assertEqual(f.read(), source)
 
+    def test_hash_settings(self):
+        self.assertEqual(self.environment.fingerprint_length, 40)
+        environment = Environment(STATIC_DIR, hash_name='md5', fingerprint_length=8)
+        self.assertEqual(environment.fingerprint_length, 8)
+        self.assertEqual(environment.get_hexdigest(b'a'),
+                         '0cc175b9c0f1b6a831c399e269772661')
+
+    def test_unknown_hash(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Environment(STATIC_DIR, hash_name='unknown')
+
+    def test_hash_with_variable_digest_size(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Environment(STATIC_DIR, hash_name='shake_128')
+
+    def test_invalid_fingerprint_length(self):
+        for fingerprint_length in (0, -4):
+            with self.assertRaises(ImproperlyConfigured):
+                Environment(STATIC_DIR, fingerprint_length=fingerprint_length)
+
+    def test_rebuild_refreshes_finders(self):
+        finder = Mock()
+        self.environment.finders.register(finder)
+        self.environment.save = Mock()
+        self.environment.rebuild(['/assets/js/script.js'])
+        finder.refresh.assert_called_once_with(['/assets/js/script.js'])
+
 
 class EnvironmentListTests(TestCase):
 
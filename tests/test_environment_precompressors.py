@@ -0,0 +1,27 @@
+from gears.environment import Precompressors
+from gears.precompressors import GzipPrecompressor
+
+from mock import Mock
+from unittest2 import TestCase
+
+
+class PrecompressorsTests(TestCase):
+
+    def setUp(self):
+        self.precompressors = Precompressors()
+
+    def test_register_defaults(self):
+        self.precompressors.register_defaults()
+        precompressors = self.precompressors.get('text/css')
+        self.assertEqual(len(precompressors), 1)
+        self.assertIsInstance(precompressors[0], GzipPrecompressor)
+
+    def test_get_for_mimetype(self):
+        first, second = Mock(), Mock()
+        self.precompressors.register('*', first)
+        self.precompressors.register('text/css', second)
+        self.assertEqual(self.precompressors.get('text/css'), [second])
+        self.assertEqual(self.precompressors.get('text/plain'), [first])
+
+    def test_get_if_nothing_registered(self):
+        self.assertEqual(self.precompressors.get('text/css'), [])
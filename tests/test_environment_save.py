@@ -0,0 +1,388 @@
+import json
+import os
+import shutil
+import tempfile
+
+from gears import archives
+from gears.assets import build_asset
+from gears.cache import SimpleCache
+from gears.environment import Environment
+from gears.exceptions import FileNotFound
+from gears.finders import FileSystemFinder
+from gears.scheduler import BuildScheduler
+
+from mock import Mock, patch
+
+from .helpers import GearsTestCase
+
+
+class EnvironmentSaveTests(GearsTestCase):
+
+    fixtures_root = 'environment_save'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def get_environment(self, fixture, root=None, **kwargs):
+        environment = Environment(root or self.root, **kwargs)
+        environment.finders.register(self.get_finder(fixture))
+        environment.register_defaults()
+        return environment
+
+    def read_manifest(self, root=None):
+        with open(os.path.join(root or self.root, '.manifest.json')) as f:
+            return json.load(f)
+
+    def list_files(self, root):
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, root)] = f.read()
+        return files
+
+    def test_saves_public_assets(self):
+        self.get_environment('save').save()
+        self.assertItemsEqual(self.read_manifest()['files'], [
+            'css/style.css', 'js/script.js', 'js/other.js', 'js/lonely.js',
+            'robots.txt',
+        ])
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'js', 'lib')))
+
+    def test_parallel_save_is_the_same_as_sequential(self):
+        parallel_root = tempfile.mkdtemp()
+        try:
+            self.get_environment('save').save()
+            self.get_environment('save', parallel_root).save(jobs=2)
+            self.assertEqual(self.list_files(parallel_root),
+                             self.list_files(self.root))
+        finally:
+            shutil.rmtree(parallel_root)
+
+    def test_uses_configured_fingerprints(self):
+        environment = self.get_environment('save', hash_name='md5',
+                                           fingerprint_length=12)
+        environment.save()
+        hexdigest_path = self.read_manifest()['files']['js/script.js']
+        self.assertRegex(hexdigest_path, r'^js/script\.[0-9a-f]{12}\.js$')
+        asset = build_asset(environment, hexdigest_path)
+        self.assertEqual(asset.attributes.logical_path, 'js/script.js')
+
+    def test_save_asset_waits_for_precompressed_copies(self):
+        environment = self.get_environment('save', gzip=True)
+        environment.writer.pool_threshold = 0
+        environment.save_asset('js/script.js')
+        self.assertEqual(environment.writer._results, [])
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'js', 'script.js.gz')))
+
+    def test_uses_compressors_registered_between_builds(self):
+        environment = self.get_environment('save')
+        with environment.session:
+            source = str(build_asset(environment, 'js/script.js'))
+            environment.compressors.register(
+                'application/javascript', lambda asset: asset.bundled_source.upper())
+            self.assertEqual(str(build_asset(environment, 'js/script.js')),
+                             source.upper())
+
+    def test_reads_shared_files_once(self):
+        environment = self.get_environment('save', verify_sources=True)
+        shared_path = os.path.join(self.get_fixture_path('save'), 'js', 'lib',
+                                   'shared.js')
+        with patch('gears.archives.read', side_effect=archives.read) as mock_read:
+            environment.save()
+        calls = [c for c in mock_read.call_args_list if c[0][0] == shared_path]
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(environment.session.active)
+
+    def test_collects_cache_stats_per_build(self):
+        environment = self.get_environment('save', cache_stats=True)
+        environment.save()
+        stats = environment.cache_stats.as_dict()
+        self.assertGreater(stats['data']['misses'], 0)
+        self.assertGreater(stats['total']['sets'], 0)
+        environment.save()
+        stats = environment.cache_stats.as_dict()
+        self.assertEqual(stats['data']['misses'], 0)
+        self.assertGreater(stats['data']['hits'], 0)
+
+    def test_collects_cache_stats_of_workers(self):
+        environment = self.get_environment('save', cache_stats=True)
+        environment.save(jobs=2)
+        self.assertGreater(environment.cache_stats.as_dict()['data']['sets'], 0)
+
+
+class TemporaryAssetsTestCase(GearsTestCase):
+
+    fixtures_root = 'environment_save'
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.assets_dir = os.path.join(tempfile.mkdtemp(), 'assets')
+        shutil.copytree(self.get_fixture_path('save'), self.assets_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+        shutil.rmtree(os.path.dirname(self.assets_dir))
+
+    def get_environment(self, **kwargs):
+        environment = Environment(self.root, gzip=True, **kwargs)
+        environment.finders.register(FileSystemFinder([self.assets_dir]))
+        environment.register_defaults()
+        return environment
+
+
+class IncrementalSaveTests(TemporaryAssetsTestCase):
+
+    def reset_mtimes(self):
+        mtimes = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                os.utime(path, (0, 0))
+                mtimes[path] = os.stat(path).st_mtime
+        return mtimes
+
+    def test_does_not_rewrite_unchanged_files(self):
+        self.get_environment().save()
+        mtimes = self.reset_mtimes()
+        self.get_environment().save()
+        self.assertEqual(dict((p, os.stat(p).st_mtime) for p in mtimes), mtimes)
+
+    def test_rewrites_changed_files(self):
+        self.get_environment().save()
+        mtimes = self.reset_mtimes()
+        with open(os.path.join(self.assets_dir, 'js', 'lonely.js'), 'a') as f:
+            f.write('var changed = 1;\n')
+        environment = self.get_environment()
+        environment.save()
+        changed = set(p for p in mtimes if os.stat(p).st_mtime != mtimes[p])
+        self.assertEqual(changed, set([
+            os.path.join(self.root, 'js', 'lonely.js'),
+            os.path.join(self.root, 'js', 'lonely.js.gz'),
+            os.path.join(self.root, '.manifest.json'),
+        ]))
+        hexdigest_path = environment.manifest.files['js/lonely.js']
+        self.assertTrue(os.path.exists(os.path.join(self.root, hexdigest_path)))
+
+    def test_restores_deleted_files(self):
+        self.get_environment().save()
+        os.remove(os.path.join(self.root, 'js', 'script.js.gz'))
+        self.get_environment().save()
+        self.assertTrue(os.path.exists(os.path.join(self.root, 'js', 'script.js.gz')))
+
+
+class RebuildTests(TemporaryAssetsTestCase):
+
+    def test_rebuilds_assets_with_changed_sources(self):
+        graph_path = os.path.join(os.path.dirname(self.assets_dir), 'graph.json')
+        self.get_environment(graph_path=graph_path).save()
+        path = os.path.join(self.assets_dir, 'js', 'lib', 'shared.js')
+        with open(path, 'a') as f:
+            f.write('var changed = 1;\n')
+        environment = self.get_environment(graph_path=graph_path)
+        old_hexdigest_path = environment.manifest.files['js/script.js']
+        rebuilt = environment.rebuild([path])
+        self.assertEqual(rebuilt, set(['js/other.js', 'js/script.js']))
+        manifest = self.read_manifest()
+        self.assertNotEqual(manifest['files']['js/script.js'], old_hexdigest_path)
+        self.assertEqual(manifest['files']['js/script.js'],
+                         environment.manifest.files['js/script.js'])
+
+    def test_rebuilds_bundles_with_shared_requirement_using_the_same_cache(self):
+        environment = self.get_environment()
+        environment.save()
+        old_files = dict(environment.manifest.files)
+        path = os.path.join(self.assets_dir, 'js', 'lib', 'shared.js')
+        with open(path, 'a') as f:
+            f.write('var changed = 1;\n')
+        rebuilt = environment.rebuild([path])
+        self.assertEqual(rebuilt, set(['js/other.js', 'js/script.js']))
+        for logical_path in rebuilt:
+            self.assertNotEqual(environment.manifest.files[logical_path],
+                                old_files[logical_path])
+            with open(os.path.join(self.root, logical_path)) as f:
+                self.assertIn('var changed = 1;', f.read())
+
+    def test_raises_build_errors(self):
+        environment = self.get_environment()
+        environment.save()
+        old_hexdigest_path = environment.manifest.files['js/script.js']
+        path = os.path.join(self.assets_dir, 'js', 'script.js')
+        with open(path, 'w') as f:
+            f.write('//= require lib/nope\n')
+        with self.assertRaises(FileNotFound):
+            environment.rebuild([path])
+        self.assertEqual(self.read_manifest()['files']['js/script.js'], old_hexdigest_path)
+
+    def test_stores_graph_in_cache(self):
+        cache = SimpleCache()
+        self.get_environment(cache=cache).save()
+        self.assertEqual(list(self.read_manifest()), ['files'])
+        environment = self.get_environment(cache=cache)
+        self.assertIn('js/script.js', environment.graph)
+        path = os.path.join(self.assets_dir, 'js', 'lib', 'shared.js')
+        self.assertEqual(environment.rebuild([path]),
+                         set(['js/other.js', 'js/script.js']))
+
+    def test_saves_everything_without_previous_build(self):
+        rebuilt = self.get_environment().rebuild([])
+        self.assertEqual(len(rebuilt), 5)
+        self.assertEqual(len(self.read_manifest()['files']), 5)
+
+    def read_manifest(self):
+        with open(os.path.join(self.root, '.manifest.json')) as f:
+            return json.load(f)
+
+
+class StopWatching(Exception):
+    pass
+
+
+class WatchTests(TemporaryAssetsTestCase):
+
+    def watch(self, environment, *changes):
+        # Changes can be callables, which change files after the initial save
+        # and return changed paths.
+        changes = iter(list(changes) + [StopWatching()])
+
+        def wait():
+            change = next(changes)
+            if isinstance(change, Exception):
+                raise change
+            return change() if callable(change) else change
+
+        watcher = Mock()
+        watcher.wait.side_effect = wait
+        with self.assertRaises(StopWatching):
+            environment.watch(watcher)
+        watcher.close.assert_called_once_with()
+
+    def get_asset_path(self, path):
+        return os.path.join(self.assets_dir, path)
+
+    def test_rebuilds_assets_with_changed_sources(self):
+        environment = self.get_environment()
+        save_asset = environment._save_asset = Mock(wraps=environment._save_asset)
+        path = self.get_asset_path('js/lib/shared.js')
+
+        def change():
+            with open(path, 'a') as f:
+                f.write('var changed = 1;\n')
+            return set([path])
+
+        self.watch(environment, set(), change)
+        self.assertEqual(
+            [c[0][0] for c in save_asset.call_args_list[6:]],
+            ['js/lib/shared.js', 'js/other.js', 'js/script.js'],
+        )
+        with open(os.path.join(self.root, 'js', 'script.js')) as f:
+            self.assertIn('var changed = 1;', f.read())
+
+    def test_goes_on_after_build_errors(self):
+        environment = self.get_environment()
+        path = self.get_asset_path('js/script.js')
+
+        def break_script():
+            with open(path, 'w') as f:
+                f.write('//= require lib/nope\n')
+            return set([path])
+
+        def fix_script():
+            with open(path, 'w') as f:
+                f.write('var fixed = 1;\n')
+            return set([path])
+
+        with patch('gears.environment.logger') as logger:
+            self.watch(environment, break_script, fix_script)
+        self.assertTrue(logger.exception.called)
+        with open(os.path.join(self.root, 'js', 'script.js')) as f:
+            self.assertIn('var fixed = 1;', f.read())
+
+    def test_saves_new_assets(self):
+        environment = self.get_environment()
+        with open(self.get_asset_path('js/new.js'), 'w') as f:
+            f.write('//= public\n')
+        self.watch(environment, set([self.get_asset_path('js/new.js')]))
+        self.assertIn('js/new.js', environment.manifest.files)
+        self.assertIn('js/new.js', environment.graph)
+
+    def test_forgets_removed_assets(self):
+        environment = self.get_environment()
+        os.remove(self.get_asset_path('js/lonely.js'))
+        self.watch(environment, set([self.get_asset_path('js/lonely.js')]))
+        self.assertNotIn('js/lonely.js', environment.manifest.files)
+        self.assertNotIn('js/lonely.js', environment.graph)
+
+    def test_saves_everything_if_changes_are_lost(self):
+        environment = self.get_environment()
+        environment.save = Mock(wraps=environment.save)
+        self.watch(environment, None)
+        self.assertEqual(environment.save.call_count, 2)
+
+
+class BuildSchedulerTests(GearsTestCase):
+
+    fixtures_root = 'environment_save'
+
+    def setUp(self):
+        self.environment = Environment(tempfile.mkdtemp())
+        self.environment.finders.register(self.get_finder('save'))
+        self.environment.register_defaults()
+
+    def tearDown(self):
+        shutil.rmtree(self.environment.root)
+
+    def get_items(self):
+        return sorted((os.path.normpath(attributes.logical_path), path)
+                      for attributes, path in self.environment.list('**'))
+
+    def get_plan(self):
+        with self.environment.session:
+            shared, groups = BuildScheduler(self.environment, 2).plan(self.get_items())
+        return [path for _, path in shared], groups
+
+    def test_plans_by_directives_if_cache_is_cold(self):
+        shared, groups = self.get_plan()
+        self.assertEqual(shared, [os.path.join(self.get_fixture_path('save'),
+                                               'js', 'lib', 'shared.js')])
+        self.assertEqual(len(groups), 6)
+
+    def test_plans_by_cached_requirements(self):
+        self.environment.save()
+        with patch('gears.scheduler.CheckAsset') as check_asset:
+            shared, groups = self.get_plan()
+        self.assertFalse(check_asset.called)
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(len(groups), 6)
+
+    def test_groups_assets_with_requirements_that_are_not_shared(self):
+        self.use_assets({'js/app.js': '//= require lib/app\n',
+                         'js/lib/app.js': 'var app = 1;\n'})
+        shared, groups = self.get_plan()
+        self.assertEqual(shared, [])
+        self.assertEqual(groups, [['js/app.js', 'js/lib/app.js']])
+
+    def test_builds_bundles_requiring_common_library_in_parallel(self):
+        files = {'js/common.js': 'var common = 1;\n'}
+        for i in range(6):
+            files['js/bundle%d.js' % i] = '//= public\n//= require common\n'
+        path = self.use_assets(files)
+        shared, groups = self.get_plan()
+        self.assertEqual(shared, [os.path.join(path, 'js', 'common.js')])
+        self.assertEqual(len(groups), 7)
+
+    def use_assets(self, files):
+        path = os.path.join(self.environment.root, 'assets')
+        for name, source in files.items():
+            filename = os.path.join(path, name)
+            if not os.path.exists(os.path.dirname(filename)):
+                os.makedirs(os.path.dirname(filename))
+            with open(filename, 'w') as f:
+                f.write(source)
+        del self.environment.finders[:]
+        self.environment.finders.register(FileSystemFinder([path]))
+        return path
@@ -1,7 +1,14 @@
+import os
 import tempfile
+import threading
+import time
 import shutil
+import zipfile
+from gears.archives import close_archive
 from gears.cache import FileBasedCache
-from unittest2 import TestCase
+from gears.cache.file_based import fcntl
+from mock import call, patch
+from unittest2 import TestCase, skipIf
 
 
 class FileBasedCacheTests(TestCase):
@@ -19,3 +26,173 @@ class FileBasedCacheTests(TestCase):
 
     def test_returns_none_if_key_not_found(self):
         self.assertIsNone(self.cache.get('a'))
+
+    def test_replaces_entries_atomically(self):
+        self.cache.set('a', 1)
+        filepath = self.cache._get_filepath('a')
+        inode = os.stat(filepath).st_ino
+        self.cache.set('a', 2)
+        self.assertNotEqual(os.stat(filepath).st_ino, inode)
+        self.assertEqual(os.listdir(os.path.dirname(filepath)),
+                         [os.path.basename(filepath)])
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_returns_none_for_truncated_entry(self):
+        self.cache.set('a', 'value')
+        with open(self.cache._get_filepath('a'), 'wb'):
+            pass
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_returns_none_for_other_key_with_same_file(self):
+        self.cache.set('a', 'value')
+        filepath = self.cache._get_filepath('b')
+        os.makedirs(os.path.dirname(filepath))
+        os.rename(self.cache._get_filepath('a'), filepath)
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_delete(self):
+        self.cache.set('a', 'value')
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+
+class FileBasedCachePruneTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = FileBasedCache(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def set(self, key, atime):
+        self.cache.set(key, 'x' * 1000)
+        os.utime(self.cache._get_filepath(key), (atime, atime))
+
+    def test_removes_least_recently_used_entries(self):
+        self.set('a', 100)
+        self.set('b', 300)
+        self.set('c', 200)
+        size = os.stat(self.cache._get_filepath('a')).st_size
+        self.assertEqual(self.cache.prune(max_size=size * 2), 1)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.assertEqual(self.cache.get_size(), size * 2)
+
+    def test_removes_entries_of_missing_files(self):
+        path = __file__
+        missing_path = os.path.join(self.root, 'missing.js')
+        keys = ['asset:0123456789ab:%s:data' % path,
+                'asset:0123456789ab:%s:data' % missing_path,
+                'dependency:0.7.2:%s' % missing_path,
+                'other']
+        for key in keys:
+            self.cache.set(key, 'value')
+        self.assertEqual(self.cache.prune(remove_missing=True), 2)
+        self.assertEqual([k for k in keys if self.cache.get(k) is not None],
+                         [keys[0], keys[3]])
+
+    def test_keeps_entries_of_files_in_archives(self):
+        directory = tempfile.mkdtemp()
+        archive_path = os.path.join(directory, 'assets.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            archive.writestr('js/a.js', b'')
+        keys = ['dependency:0.7.2:%s' % os.path.join(archive_path, 'js', 'a.js'),
+                'dependency:0.7.2:%s' % os.path.join(archive_path, 'js', 'b.js')]
+        for key in keys:
+            self.cache.set(key, 'value')
+        try:
+            self.assertEqual(self.cache.prune(remove_missing=True), 1)
+            self.assertIsNotNone(self.cache.get(keys[0]))
+        finally:
+            close_archive(archive_path)
+            shutil.rmtree(directory)
+
+    def test_removes_unreadable_entries(self):
+        self.cache.set('a', 'value')
+        with open(self.cache._get_filepath('a'), 'wb'):
+            pass
+        self.assertEqual(self.cache.prune(remove_missing=True), 1)
+
+    def test_limits_size(self):
+        self.cache.set('a', 'x' * 1000)
+        size = os.stat(self.cache._get_filepath('a')).st_size
+        self.cache.max_size = size * 3
+        for key in 'bcde':
+            self.set(key, 1000)
+        self.assertLessEqual(self.cache.get_size(), size * 3)
+        self.assertIsNotNone(self.cache.get('e'))
+
+    def test_stores_size(self):
+        self.cache.max_size = 10 ** 6
+        self.cache.set('a', 'x' * 1000)
+        size = self.cache.get_size()
+        cache = FileBasedCache(self.root, max_size=10 ** 6)
+        with patch.object(cache, 'get_size') as get_size:
+            cache.set('b', 'x' * 1000)
+        self.assertFalse(get_size.called)
+        self.assertEqual(cache._read_size(), size * 2)
+        cache.prune(max_size=size)
+        self.assertEqual(cache._read_size(), size)
+
+    def test_touches_entries_on_read_if_size_is_limited(self):
+        self.cache.max_size = 10 ** 6
+        self.set('a', 100)
+        self.cache.get('a')
+        self.assertGreater(os.stat(self.cache._get_filepath('a')).st_mtime, 100)
+
+
+@skipIf(fcntl is None, 'fcntl is not available')
+class FileBasedCacheLockTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = FileBasedCache(self.root, locking=True, lock_timeout=5)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_lock_is_exclusive(self):
+        events = []
+
+        def build():
+            with self.cache.lock('a'):
+                events.append('second')
+
+        with self.cache.lock('a'):
+            thread = threading.Thread(target=build)
+            thread.start()
+            time.sleep(0.05)
+            events.append('first')
+        thread.join()
+        self.assertEqual(events, ['first', 'second'])
+
+    def test_lock_timeout(self):
+        self.cache.lock_timeout = 0
+        with self.cache.lock('a'):
+            with self.cache.lock('a'):
+                pass
+
+    def test_prune_removes_lock_files_of_removed_entries(self):
+        for key in 'abc':
+            with self.cache.lock(key):
+                self.cache.set(key, 'value')
+        with self.cache.lock('d'):
+            with patch('gears.cache.file_based.os.walk', wraps=os.walk) as walk:
+                self.cache.prune(max_size=0, remove_missing=True)
+            self.assertEqual([c for c in walk.call_args_list if c[0][0] == self.root],
+                             [call(self.root)])
+            self.assertEqual(self.list_files(), [self.cache._get_filepath('d') + '.lock'])
+        self.cache.prune()
+        self.assertEqual(self.list_files(), [])
+
+    def test_lock_does_nothing_if_locking_is_disabled(self):
+        self.cache.locking = False
+        with self.cache.lock('a'):
+            self.assertEqual(os.listdir(self.root), [])
+
+    def list_files(self):
+        return [os.path.join(dirpath, filename)
+                for dirpath, dirnames, filenames in os.walk(self.root)
+                for filename in filenames]
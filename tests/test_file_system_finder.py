@@ -1,7 +1,9 @@
 import os
+import shutil
+import tempfile
 
 from gears.exceptions import ImproperlyConfigured, FileNotFound
-from gears.finders import FileSystemFinder
+from gears.finders import FileSystemFinder, IndexedFileSystemFinder
 
 from mock import patch, Mock
 from unittest2 import TestCase
@@ -97,3 +99,53 @@ class FileSystemFinderTests(TestCase):
             ('js/templates/c.js.handlebars', os.path.join(ASSETS_DIR, 'js/templates/c.js.handlebars')),
             ('js/templates/d/e.js.handlebars', os.path.join(ASSETS_DIR, 'js/templates/d/e.js.handlebars')),
         ))
+
+
+class IndexedFileSystemFinderTests(TestCase):
+
+    def setUp(self):
+        self.finder = IndexedFileSystemFinder([ASSETS_DIR])
+
+    def test_find(self):
+        self.assertEqual(self.finder.find('js/templates/a.js.handlebars'),
+                         os.path.join(ASSETS_DIR, 'js/templates/a.js.handlebars'))
+        self.assertEqual(self.finder.find('js/templates'),
+                         os.path.join(ASSETS_DIR, 'js/templates'))
+        with self.assertRaises(FileNotFound):
+            self.finder.find('js/templates/a.js')
+
+    @patch('os.path.exists')
+    def test_find_does_not_stat_files(self, exists):
+        self.finder.index
+        with self.assertRaises(FileNotFound):
+            self.finder.find('js/missing.js')
+        self.assertFalse(exists.called)
+
+    def test_list_is_the_same_as_without_index(self):
+        finder = FileSystemFinder([ASSETS_DIR])
+        for path in ('js/templates/*', 'js/templates/**', 'js/*/*.handlebars',
+                     'js/**/e.js.*', 'js/views/*', '**'):
+            self.assertItemsEqual(self.finder.list(path), finder.list(path))
+
+    def test_refresh(self):
+        root = tempfile.mkdtemp()
+        try:
+            finder = IndexedFileSystemFinder([root])
+            self.assertEqual(list(finder.list('**')), [])
+            os.makedirs(os.path.join(root, 'js', 'lib'))
+            path = os.path.join(root, 'js', 'lib', 'a.js')
+            with open(path, 'w') as f:
+                f.write('')
+            with self.assertRaises(FileNotFound):
+                finder.find('js/lib/a.js')
+            finder.refresh([path])
+            self.assertEqual(finder.find('js/lib/a.js'), path)
+            os.remove(path)
+            finder.refresh([path])
+            self.assertEqual(list(finder.list('js/**')), [])
+            with open(path, 'w') as f:
+                f.write('')
+            finder.refresh()
+            self.assertEqual(list(finder.list('js/**')), [('js/lib/a.js', path)])
+        finally:
+            shutil.rmtree(root)
@@ -0,0 +1,124 @@
+import gzip
+import os
+import shutil
+import stat
+import tempfile
+
+from gears.environment import Environment
+from gears.precompressors import GzipPrecompressor, ZlibPrecompressor
+from gears.writers import FileWriter
+
+from mock import patch
+from unittest2 import TestCase
+
+
+class FileWriterTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.environment = Environment(self.root, gzip=True)
+        self.writer = FileWriter(self.environment)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def get_path(self, path):
+        return os.path.join(self.root, path)
+
+    def read(self, path, opener=open):
+        with opener(self.get_path(path), 'rb') as f:
+            return f.read()
+
+    def test_writes_source(self):
+        self.writer.write(['js/script.js'], b'source')
+        self.assertEqual(self.read('js/script.js'), b'source')
+        self.assertEqual(os.listdir(self.get_path('js')), ['script.js'])
+
+    def test_reads_umask_once(self):
+        with patch('gears.writers.get_umask') as get_umask:
+            self.writer.pool_threshold = 0
+            self.writer.write(['js/script.js'], b'source', True)
+            self.writer.wait()
+        self.assertFalse(get_umask.called)
+        mode = stat.S_IMODE(os.stat(self.get_path('js/script.js')).st_mode)
+        self.assertEqual(mode, 0o666 & ~self.writer.umask)
+
+    def test_links_other_paths(self):
+        self.writer.write(['js/script.js', 'js/script.123.js'], b'source')
+        self.assertTrue(os.path.samefile(self.get_path('js/script.js'),
+                                         self.get_path('js/script.123.js')))
+
+    def test_gzips_source_once(self):
+        self.writer.write(['js/script.js', 'js/script.123.js'], b'source', True)
+        self.assertEqual(self.read('js/script.js.gz', gzip.open), b'source')
+        self.assertTrue(os.path.samefile(self.get_path('js/script.js.gz'),
+                                         self.get_path('js/script.123.js.gz')))
+
+    def test_gzipped_source_is_reproducible(self):
+        self.writer.write(['js/script.js'], b'source', True)
+        gzipped_source = self.read('js/script.js.gz')
+        os.remove(self.get_path('js/script.js.gz'))
+        self.writer.write(['js/script.js'], b'source', True)
+        self.assertEqual(self.read('js/script.js.gz'), gzipped_source)
+
+    def test_does_not_gzip_if_disabled(self):
+        self.environment.gzip = False
+        self.writer.write(['js/script.js'], b'source', True)
+        self.assertFalse(os.path.exists(self.get_path('js/script.js.gz')))
+
+    def test_replaces_file_without_changing_old_links(self):
+        self.writer.write(['js/script.js', 'js/script.123.js'], b'old')
+        self.writer.write(['js/script.js', 'js/script.456.js'], b'new')
+        self.assertEqual(self.read('js/script.js'), b'new')
+        self.assertEqual(self.read('js/script.456.js'), b'new')
+        self.assertEqual(self.read('js/script.123.js'), b'old')
+
+    def test_does_not_rewrite_unchanged_file(self):
+        self.writer.write(['js/script.js'], b'source')
+        inode = os.stat(self.get_path('js/script.js')).st_ino
+        self.writer.write(['js/script.js'], b'source')
+        self.assertEqual(os.stat(self.get_path('js/script.js')).st_ino, inode)
+
+    def test_fails_if_directory_is_a_file(self):
+        with open(self.get_path('js'), 'w') as f:
+            f.write('')
+        with self.assertRaises(OSError):
+            self.writer.write(['js/script.js'], b'source')
+
+    def test_uses_precompressors_for_mimetype(self):
+        self.environment.precompressors.register('text/css', ZlibPrecompressor())
+        self.writer.write(['css/style.css'], b'source', True, 'text/css')
+        self.assertTrue(os.path.exists(self.get_path('css/style.css.deflate')))
+        self.assertFalse(os.path.exists(self.get_path('css/style.css.gz')))
+
+    def test_removes_skipped_copies(self):
+        self.writer.write(['js/script.js'], b'source', True)
+        self.environment.precompressors.clear()
+        self.environment.precompressors.register(
+            '*', GzipPrecompressor(only_if_smaller=True))
+        self.writer.write(['js/script.js'], b'changed', True)
+        self.assertFalse(os.path.exists(self.get_path('js/script.js.gz')))
+
+    def test_is_written_if_copy_was_skipped(self):
+        self.environment.precompressors.clear()
+        precompressor = GzipPrecompressor(only_if_smaller=True)
+        self.environment.precompressors.register('*', precompressor)
+        args = (['js/script.js'], b'source', True)
+        self.writer.write(*args)
+        self.assertFalse(os.path.exists(self.get_path('js/script.js.gz')))
+        self.assertTrue(self.writer.is_written(*args))
+        self.assertFalse(self.writer.is_written(['js/script.js'], b'changed', True))
+
+    def test_precompresses_large_sources_in_pool(self):
+        self.writer.pool_threshold = 0
+        self.writer.write(['js/script.js', 'js/script.123.js'], b'source', True)
+        self.writer.wait()
+        self.assertEqual(self.read('js/script.123.js.gz', gzip.open), b'source')
+
+    def test_is_written(self):
+        args = (['js/script.js', 'js/script.123.js'], b'source', True)
+        self.assertFalse(self.writer.is_written(*args))
+        self.writer.write(*args)
+        self.assertTrue(self.writer.is_written(*args))
+        os.remove(self.get_path('js/script.123.js.gz'))
+        self.assertFalse(self.writer.is_written(*args))
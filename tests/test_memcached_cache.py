@@ -0,0 +1,80 @@
+import socket
+import threading
+
+from gears.cache import MemcachedCache
+from gears.cache.server import CacheServer
+
+from unittest2 import TestCase
+
+
+class MemcachedCacheTests(TestCase):
+
+    def setUp(self):
+        self.server = CacheServer(('127.0.0.1', 0))
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.cache = MemcachedCache(self.server.server_address, timeout=1)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_saves_value_for_key(self):
+        self.cache.set('asset:/js/script.js:data', {'mtime': 1})
+        self.assertEqual(self.cache.get('asset:/js/script.js:data'), {'mtime': 1})
+
+    def test_returns_none_if_key_not_found(self):
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_get_many_and_set_many(self):
+        values = dict(('key %d' % i, i) for i in range(250))
+        self.cache.set_many(values)
+        keys = list(values) + ['missing']
+        self.assertEqual(self.cache.get_many(keys), values)
+
+    def test_delete(self):
+        self.cache.set('a', 1)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_does_not_save_too_large_values(self):
+        self.cache.max_value_size = 10
+        self.cache.set('a', 'x' * 100)
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_reuses_connections(self):
+        self.cache.set('a', 1)
+        connection = self.cache._connections[0]
+        self.cache.get('a')
+        self.assertEqual(self.cache._connections, [connection])
+
+    def test_prefixes_keys(self):
+        self.cache.set('a', 1)
+        other_cache = MemcachedCache(self.server.server_address, prefix='other')
+        self.assertIsNone(other_cache.get('a'))
+
+
+class MemcachedCacheFailureTests(TestCase):
+
+    def setUp(self):
+        # The socket accepts connections, but never replies.
+        self.socket = socket.socket()
+        self.socket.bind(('127.0.0.1', 0))
+        self.socket.listen(5)
+
+    def tearDown(self):
+        self.socket.close()
+
+    def test_timeout_is_a_miss(self):
+        cache = MemcachedCache(self.socket.getsockname(), timeout=0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache._connections, [])
+
+    def test_unavailable_server_is_a_miss(self):
+        address = self.socket.getsockname()
+        self.socket.close()
+        cache = MemcachedCache(address, timeout=0.1)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
@@ -0,0 +1,74 @@
+from gears.cache import MemoryCache
+from gears.cache.keys import get_key_family, get_key_path
+from gears.cache.memory import get_size
+
+from unittest2 import TestCase
+
+
+class GetKeyFamilyTests(TestCase):
+
+    def test_asset_keys(self):
+        self.assertEqual(get_key_family('asset:/js/script.js:data'), 'data')
+        self.assertEqual(get_key_family('asset:C:/js/script.js:bundled_source'),
+                         'bundled_source')
+        self.assertEqual(get_key_family('asset:/js/script.js:compressed_source'),
+                         'compressed_source')
+
+    def test_dependency_keys(self):
+        self.assertEqual(get_key_family('dependency:/js/script.js'), 'dependency')
+
+    def test_key_paths(self):
+        self.assertEqual(get_key_path('asset:0123456789ab:/js/a.js:data'), '/js/a.js')
+        self.assertEqual(get_key_path('asset:C:/js/a.js:check'), 'C:/js/a.js')
+        self.assertEqual(get_key_path('dependency:0.7.2:C:/js'), 'C:/js')
+        self.assertEqual(get_key_path('dependency:0.7.2:0123456789ab:/js'), '/js')
+        self.assertIsNone(get_key_path('other'))
+
+    def test_other_keys(self):
+        self.assertEqual(get_key_family('asset:/js/script.js:unknown'), 'other')
+        self.assertEqual(get_key_family('a'), 'other')
+
+
+class MemoryCacheTests(TestCase):
+
+    def setUp(self):
+        self.size = get_size('x' * 100)
+        self.cache = MemoryCache(budgets={'compressed_source': self.size * 2})
+
+    def key(self, name):
+        return 'asset:/%s:compressed_source' % name
+
+    def test_saves_value_for_key(self):
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+
+    def test_returns_none_if_key_not_found(self):
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_accounts_sizes(self):
+        self.cache.set(self.key('a'), 'x' * 100)
+        self.assertEqual(self.cache.sizes['compressed_source'], self.size)
+        self.cache.set(self.key('a'), 'y' * 100)
+        self.assertEqual(self.cache.sizes['compressed_source'], self.size)
+        self.cache.delete(self.key('a'))
+        self.assertEqual(self.cache.sizes['compressed_source'], 0)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set(self.key('a'), 'a' * 100)
+        self.cache.set(self.key('b'), 'b' * 100)
+        self.cache.get(self.key('a'))
+        self.cache.set(self.key('c'), 'c' * 100)
+        self.assertIsNone(self.cache.get(self.key('b')))
+        self.assertEqual(self.cache.get(self.key('a')), 'a' * 100)
+        self.assertEqual(self.cache.get(self.key('c')), 'c' * 100)
+
+    def test_families_have_separate_budgets(self):
+        self.cache.set('asset:/a:data', {'processed_source': 'x' * 1000})
+        self.cache.set(self.key('a'), 'a' * 100)
+        self.cache.set(self.key('b'), 'b' * 100)
+        self.assertEqual(len(self.cache), 3)
+
+    def test_skips_values_larger_than_budget(self):
+        self.cache.set(self.key('a'), 'a' * 1000)
+        self.assertIsNone(self.cache.get(self.key('a')))
+        self.assertEqual(self.cache.sizes['compressed_source'], 0)
@@ -0,0 +1,49 @@
+from gears.exceptions import ImproperlyConfigured
+from gears.precompressors import (
+    BrotliPrecompressor, GzipPrecompressor, ZlibPrecompressor,
+    ZstdPrecompressor
+)
+
+from mock import patch
+from unittest2 import TestCase
+
+
+SOURCE = b'body { color: red; }\n' * 100
+
+
+class PrecompressorTests(TestCase):
+
+    def test_gzip(self):
+        precompressor = GzipPrecompressor()
+        compressed_source = precompressor(SOURCE)
+        self.assertLess(len(compressed_source), len(SOURCE))
+        self.assertEqual(precompressor.decompress(compressed_source), SOURCE)
+
+    def test_zlib(self):
+        precompressor = ZlibPrecompressor(level=1)
+        compressed_source = precompressor(SOURCE)
+        self.assertLess(len(compressed_source), len(SOURCE))
+        self.assertEqual(precompressor.decompress(compressed_source), SOURCE)
+
+    def test_default_level(self):
+        self.assertEqual(GzipPrecompressor().level, 9)
+        self.assertEqual(GzipPrecompressor(level=5).level, 5)
+
+    def test_skips_small_sources(self):
+        precompressor = GzipPrecompressor(min_size=len(SOURCE) + 1)
+        self.assertFalse(precompressor.accepts(SOURCE))
+        self.assertIsNone(precompressor(SOURCE))
+
+    def test_skips_if_not_smaller(self):
+        self.assertIsNotNone(GzipPrecompressor()(b'a'))
+        self.assertIsNone(GzipPrecompressor(only_if_smaller=True)(b'a'))
+
+    @patch('gears.precompressors.brotli.brotli_available', False)
+    def test_brotli_is_not_available(self):
+        with self.assertRaises(ImproperlyConfigured):
+            BrotliPrecompressor()
+
+    @patch('gears.precompressors.zstd.zstandard_available', False)
+    def test_zstd_is_not_available(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ZstdPrecompressor()
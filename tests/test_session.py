@@ -0,0 +1,77 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from gears.session import BuildSession
+
+from mock import patch
+from unittest2 import TestCase
+
+
+class BuildSessionTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'script.js')
+        self.write('var a = 1;')
+        self.session = BuildSession()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, source):
+        with open(self.path, 'w') as f:
+            f.write(source)
+
+    def test_memoizes_results_while_active(self):
+        with self.session:
+            self.assertEqual(self.session.read(self.path), b'var a = 1;')
+            hexdigest = self.session.hexdigest(self.path)
+            signature = self.session.signature(self.path)
+            self.write('var a = 2;;')
+            self.assertEqual(self.session.read(self.path), b'var a = 1;')
+            self.assertEqual(self.session.hexdigest(self.path), hexdigest)
+            self.assertEqual(self.session.signature(self.path), signature)
+            self.assertEqual(self.session.listdir(self.root), ['script.js'])
+
+    def test_does_not_memoize_results_if_not_active(self):
+        self.assertEqual(self.session.read(self.path), b'var a = 1;')
+        self.write('var a = 2;')
+        self.assertEqual(self.session.read(self.path), b'var a = 2;')
+
+    def test_forgets_results_when_outermost_session_ends(self):
+        with self.session:
+            with self.session:
+                self.session.read(self.path)
+            self.write('var a = 2;')
+            self.assertEqual(self.session.read(self.path), b'var a = 1;')
+        self.assertFalse(self.session.active)
+        with self.session:
+            self.assertEqual(self.session.read(self.path), b'var a = 2;')
+
+    def test_does_not_memoize_large_files(self):
+        self.session.max_file_size = 5
+        with self.session:
+            hexdigest = self.session.hexdigest(self.path)
+            self.write('var a = 2;')
+            self.assertEqual(self.session.read(self.path), b'var a = 2;')
+            self.assertEqual(self.session.hexdigest(self.path), hexdigest)
+
+    def test_reads_files_once(self):
+        with patch('gears.archives.open', create=True, side_effect=open) as mock_open:
+            with self.session:
+                self.session.read(self.path)
+                self.session.hexdigest(self.path)
+        self.assertEqual(mock_open.call_count, 1)
+
+    def test_hashes_large_files_in_chunks(self):
+        self.session.max_file_size = 5
+        self.session.chunk_size = 4
+        self.assertEqual(self.session.hexdigest(self.path),
+                         hashlib.sha1(b'var a = 1;').hexdigest())
+
+    def test_uses_hash_name(self):
+        session = BuildSession('md5')
+        self.assertEqual(session.hexdigest(self.path),
+                         hashlib.md5(b'var a = 1;').hexdigest())
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from gears.cache import SQLiteCache
+from unittest2 import TestCase
+
+
+class SQLiteCacheTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'cache', 'gears.sqlite')
+        self.cache = SQLiteCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_saves_value_for_key(self):
+        self.cache.set('a', {'processed_source': u'☃'})
+        self.assertEqual(self.cache.get('a'), {'processed_source': u'☃'})
+
+    def test_returns_none_if_key_not_found(self):
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_replaces_value(self):
+        self.cache.set('a', 1)
+        self.cache.set('a', 2)
+        self.assertEqual(self.cache.get('a'), 2)
+
+    def test_delete(self):
+        self.cache.set('a', 1)
+        self.cache.delete('a')
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_get_many(self):
+        self.cache.chunk_size = 2
+        self.cache.set_many(dict(('key%d' % i, i) for i in range(5)))
+        keys = ['key%d' % i for i in range(6)]
+        self.assertEqual(self.cache.get_many(keys),
+                         dict(('key%d' % i, i) for i in range(5)))
+
+    def test_is_shared_between_instances(self):
+        self.cache.set('a', 1)
+        self.assertEqual(SQLiteCache(self.path).get('a'), 1)
+
+    def test_uses_wal_mode(self):
+        mode = self.cache.connection.execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(mode, 'wal')
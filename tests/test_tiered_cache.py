@@ -0,0 +1,55 @@
+from gears.cache import MemoryCache, SimpleCache, TieredCache
+
+from mock import MagicMock, Mock
+from unittest2 import TestCase
+
+
+class TieredCacheTests(TestCase):
+
+    def setUp(self):
+        self.backend = SimpleCache()
+        self.memory = MemoryCache()
+        self.cache = TieredCache(self.backend, self.memory)
+
+    def test_writes_through(self):
+        self.cache.set('asset:/a:data', {'mtime': 1})
+        self.assertEqual(self.backend.get('asset:/a:data'), {'mtime': 1})
+        self.assertEqual(self.memory.get('asset:/a:data'), {'mtime': 1})
+
+    def test_reads_through(self):
+        self.backend.set('asset:/a:data', {'mtime': 1})
+        self.assertEqual(self.cache.get('asset:/a:data'), {'mtime': 1})
+        self.assertEqual(self.memory.get('asset:/a:data'), {'mtime': 1})
+
+    def test_does_not_read_backend_if_found_in_memory(self):
+        self.cache.set('asset:/a:data', {'mtime': 1})
+        self.cache.backend = Mock()
+        self.assertEqual(self.cache.get('asset:/a:data'), {'mtime': 1})
+        self.assertFalse(self.cache.backend.get.called)
+
+    def test_returns_none_if_key_not_found(self):
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_promotes_hot_bundles(self):
+        key = 'asset:/a:compressed_source'
+        self.cache.set(key, 'source')
+        self.assertIsNone(self.memory.get(key))
+        self.assertEqual(self.cache.get(key), 'source')
+        self.assertIsNone(self.memory.get(key))
+        self.assertEqual(self.cache.get(key), 'source')
+        self.assertEqual(self.memory.get(key), 'source')
+        self.cache.set(key, 'changed')
+        self.assertEqual(self.memory.get(key), 'changed')
+
+    def test_lock_uses_backend(self):
+        self.backend.lock = MagicMock()
+        with self.cache.lock('a'):
+            pass
+        self.backend.lock.assert_called_once_with('a')
+
+    def test_get_many(self):
+        self.cache.set('asset:/a:data', {'mtime': 1})
+        self.backend.set('asset:/b:data', {'mtime': 2})
+        self.assertEqual(self.cache.get_many(['asset:/a:data', 'asset:/b:data', 'c']),
+                         {'asset:/a:data': {'mtime': 1}, 'asset:/b:data': {'mtime': 2}})
+        self.assertEqual(self.memory.get('asset:/b:data'), {'mtime': 2})
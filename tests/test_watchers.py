@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+
+from gears.watchers import InotifyWatcher, PollingWatcher, get_watcher
+
+from mock import patch
+from unittest2 import TestCase, skipUnless
+
+
+class WatcherTestsMixin(object):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'js'))
+        self.write('js/script.js', 'var script = 1;')
+        self.watcher = self.get_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.root)
+
+    def write(self, path, source):
+        with open(os.path.join(self.root, path), 'w') as f:
+            f.write(source)
+
+    def test_returns_nothing_if_timeout_expires(self):
+        self.assertEqual(self.watcher.wait(timeout=0), set())
+
+    def test_detects_modified_files(self):
+        self.write('js/script.js', 'var script = 2;')
+        self.assertEqual(self.watcher.wait(timeout=1),
+                         set([os.path.join(self.root, 'js/script.js')]))
+
+    def test_detects_created_files(self):
+        os.mkdir(os.path.join(self.root, 'js', 'lib'))
+        self.write('js/lib/new.js', 'var created = 1;')
+        self.assertIn(os.path.join(self.root, 'js/lib/new.js'),
+                      self.watcher.wait(timeout=1))
+
+    def test_detects_removed_files(self):
+        os.remove(os.path.join(self.root, 'js/script.js'))
+        self.assertEqual(self.watcher.wait(timeout=1),
+                         set([os.path.join(self.root, 'js/script.js')]))
+
+    def test_watches_files(self):
+        self.watcher.close()
+        self.write('assets.zip', 'old')
+        self.watcher = self.get_watcher([os.path.join(self.root, 'assets.zip')])
+        self.write('js/script.js', 'var script = 2;')
+        self.assertEqual(self.watcher.wait(timeout=0.1), set())
+        self.write('assets.zip', 'new')
+        self.assertEqual(self.watcher.wait(timeout=1),
+                         set([os.path.join(self.root, 'assets.zip')]))
+
+
+class PollingWatcherTests(WatcherTestsMixin, TestCase):
+
+    mtime = 0
+
+    def get_watcher(self, paths=None):
+        return PollingWatcher(paths or [self.root], delay=0, interval=0.01)
+
+    def write(self, path, source):
+        super(PollingWatcherTests, self).write(path, source)
+        # Make sure that the modification is detected even if the file system
+        # has low mtime resolution.
+        self.mtime += 1
+        os.utime(os.path.join(self.root, path), (self.mtime, self.mtime))
+
+
+@skipUnless(InotifyWatcher.is_available(), 'inotify is not available')
+class InotifyWatcherTests(WatcherTestsMixin, TestCase):
+
+    def get_watcher(self, paths=None):
+        return InotifyWatcher(paths or [self.root], delay=0.01)
+
+    def test_fails_if_directory_can_not_be_watched(self):
+        self.watcher.libc.inotify_add_watch = lambda *args: -1
+        with self.assertRaises(OSError):
+            self.watcher.add_directory(self.root)
+
+    def test_reports_lost_changes_if_new_directory_can_not_be_watched(self):
+        self.watcher.libc.inotify_add_watch = lambda *args: -1
+        os.mkdir(os.path.join(self.root, 'js', 'lib'))
+        self.assertIsNone(self.watcher.wait(timeout=1))
+
+
+class GetWatcherTests(TestCase):
+
+    @patch('gears.watchers.InotifyWatcher')
+    def test_falls_back_to_polling(self, InotifyWatcher):
+        InotifyWatcher.is_available.return_value = True
+        InotifyWatcher.side_effect = OSError(28, 'No space left on device')
+        self.assertIsInstance(get_watcher([]), PollingWatcher)